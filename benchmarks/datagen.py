@@ -0,0 +1,85 @@
+"""Synthetic data for the benchmarks.
+
+All generators are deterministic for a given seed so runs of different versions
+measure the same inputs.
+"""
+
+from __future__ import annotations
+
+import csv
+import random
+import string
+from pathlib import Path
+
+_FIRST_NAMES = [
+    "ana",
+    "benjamín",
+    "catalina",
+    "diego",
+    "emilia",
+    "felipe",
+    "josefa",
+    "martín",
+    "sofía",
+    "tomás",
+]
+_LAST_NAMES = [
+    "gonzález",
+    "muñoz",
+    "rojas",
+    "díaz",
+    "pérez",
+    "soto",
+    "contreras",
+    "silva",
+    "martínez",
+    "sepúlveda",
+]
+
+
+def _password(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase + string.digits, k=8))
+
+
+def credentials_rows(users: int, sites: int, seed: int = 0) -> list[list[str]]:
+    """Rows in the format of the credentials tool: (username, password, first, last, site)."""
+    rng = random.Random(seed)
+    return [
+        [
+            f"user{i:05}",
+            _password(rng),
+            rng.choice(_FIRST_NAMES),
+            rng.choice(_LAST_NAMES),
+            f"sede-{rng.randrange(sites):03}",
+        ]
+        for i in range(users)
+    ]
+
+
+def write_csv(path: Path, rows: list[list[str]], delimiter: str = ",") -> Path:
+    with path.open("w", newline="") as f:
+        csv.writer(f, delimiter=delimiter).writerows(rows)
+    return path
+
+
+def testcase_tree(
+    root: Path,
+    subtasks: int,
+    testcases: int,
+    size: int,
+    seed: int = 0,
+) -> Path:
+    """Create a tree of testcases in the layout expected by `file-copy.py`.
+
+    Inputs go in `in/` and outputs in `out/`, named `<subtask>-<name>.txt`. Each
+    subtask gets `testcases` cases of `size` bytes.
+    """
+    rng = random.Random(seed)
+    for kind in ["in", "out"]:
+        (root / kind).mkdir(parents=True, exist_ok=True)
+    for st in range(1, subtasks + 1):
+        for i in range(testcases):
+            for kind in ["in", "out"]:
+                data = rng.randbytes(size // 2).hex().encode()
+                (root / kind / f"{st}-case{i:03}.txt").write_bytes(data)
+    return root
@@ -9,12 +9,38 @@ import csv
 
 logger = logging.getLogger(__name__)
 
+try:
+    from pathlib import Path
+
+    from csv_ingest import Schema, TableCache, load
+
+    TEAMS_SCHEMA = Schema(fields=("code", "name"))
+    USERS_SCHEMA = Schema(
+        fields=("username", "password", "email", "first_name", "last_name", "team"),
+        required=5,
+    )
+
+    def read_csv(path, schema):
+        """Read a csv detecting its encoding and dialect, and skipping its header."""
+        return load(Path(path), schema, TableCache()).rows
+
+except ImportError:
+    TEAMS_SCHEMA = USERS_SCHEMA = None
+
+    def read_csv(path, schema):
+        del schema
+        with open(path, "r") as csvfile:
+            return list(csv.reader(csvfile))
+
+
 try:
     import gevent.monkey
     from sqlalchemy.exc import IntegrityError
     from cms import utf8_decoder
+    from sqlalchemy.orm import contains_eager
     from cms.db import SessionGen, User, Team, Contest, Participation
-    from cmscommon.crypto import build_password
+    from cms.grading.scoring import task_score
+    from cmscommon.crypto import build_password, parse_authentication
 
     gevent.monkey.patch_all()  # noqa
 
@@ -88,6 +114,107 @@ try:
             logger.error(e)
             return
 
+    # Rows fetched from the database at a time. Queries are streamed through a
+    # server-side cursor, so memory doesn't grow with the size of the contest.
+    EXPORT_BATCH_SIZE = 1000
+
+    def write_csv(path, rows, header=None):
+        count = 0
+        with open(path, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            if header is not None:
+                writer.writerow(header)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        logger.info(f"exported {count} rows to {path}.")
+
+    def plaintext_password(username, stored):
+        """Recover a password in the form accepted by the import commands."""
+        method, payload = parse_authentication(stored)
+        if method != "plaintext":
+            logger.warning(f"password of {username} is hashed, exporting it empty.")
+            return ""
+        return payload
+
+    def export_teams(session, path):
+        query = session.query(Team.code, Team.name).order_by(Team.code)
+        # yield_per makes psycopg2 use a server-side cursor
+        write_csv(path, query.yield_per(EXPORT_BATCH_SIZE))
+
+    def export_users(session, path):
+        query = session.query(
+            User.username,
+            User.password,
+            User.email,
+            User.first_name,
+            User.last_name,
+        ).order_by(User.username)
+
+        def rows():
+            for username, password, email, first, last in query.yield_per(
+                EXPORT_BATCH_SIZE
+            ):
+                password = plaintext_password(username, password)
+                yield (username, password, email or "", first, last)
+
+        write_csv(path, rows())
+
+    def export_participations(session, path, contest_name):
+        contest = session.query(Contest).filter(Contest.name == contest_name).one()
+        query = (
+            session.query(
+                User.username,
+                Participation.password,
+                User.password,
+                User.email,
+                User.first_name,
+                User.last_name,
+                Team.code,
+            )
+            .join(Participation, Participation.user_id == User.id)
+            .outerjoin(Team, Participation.team_id == Team.id)
+            .filter(Participation.contest_id == contest.id)
+            .order_by(User.username)
+        )
+
+        def rows():
+            for row in query.yield_per(EXPORT_BATCH_SIZE):
+                (username, password, user_password, email, first, last, team) = row
+                # Participations without a password use the one of the user
+                password = plaintext_password(username, password or user_password)
+                yield (username, password, email or "", first, last, team or "")
+
+        write_csv(path, rows())
+
+    def export_scores(session, path, contest_name):
+        contest = session.query(Contest).filter(Contest.name == contest_name).one()
+        tasks = list(contest.tasks)
+        query = (
+            session.query(Participation)
+            .join(Participation.user)
+            .options(contains_eager(Participation.user))
+            .filter(Participation.contest_id == contest.id)
+            .order_by(User.username)
+        )
+
+        def rows():
+            for participation in query.yield_per(EXPORT_BATCH_SIZE):
+                scores = [
+                    round(task_score(participation, task)[0], task.score_precision)
+                    for task in tasks
+                ]
+                row = (participation.user.username, *scores, sum(scores))
+                # task_score loads the submissions and results of the participation
+                # into the session. Expunging the participation drops them too (they
+                # cascade from it), so memory doesn't grow with the contest.
+                for obj in (participation, participation.user):
+                    if obj in session:
+                        session.expunge(obj)
+                yield row
+
+        write_csv(path, rows(), header=["username", *(t.name for t in tasks), "total"])
+
 except Exception:
 
     def import_teams(session, teams):
@@ -102,6 +229,18 @@ except Exception:
     def run_with_session(action):
         del action
 
+    def export_teams(session, path):
+        del session, path
+
+    def export_users(session, path):
+        del session, path
+
+    def export_participations(session, path, contest_name):
+        del session, path, contest_name
+
+    def export_scores(session, path, contest_name):
+        del session, path, contest_name
+
 
 def main():
     """Parse arguments and launch process."""
@@ -140,19 +279,77 @@ def main():
         help="the name of the contest",
     )
 
+    # Export teams
+    export_teams_parser = subparsers.add_parser("export-teams")
+    export_teams_parser.add_argument(
+        "output_file",
+        help="csv where teams are written in the format accepted by import-teams",
+        metavar="output-file",
+    )
+
+    # Export users
+    export_users_parser = subparsers.add_parser("export-users")
+    export_users_parser.add_argument(
+        "output_file",
+        help="csv where users are written in the format accepted by import-users. Passwords that are not stored in plaintext are exported empty",
+        metavar="output-file",
+    )
+
+    # Export participations
+    export_participations_parser = subparsers.add_parser("export-participations")
+    export_participations_parser.add_argument(
+        "contest",
+        action="store",
+        type=utf8_decoder,
+        help="the name of the contest",
+    )
+    export_participations_parser.add_argument(
+        "output_file",
+        help="csv where participations are written in the format accepted by import-participations (and import-users)",
+        metavar="output-file",
+    )
+
+    # Export scores
+    export_scores_parser = subparsers.add_parser("export-scores")
+    export_scores_parser.add_argument(
+        "contest",
+        action="store",
+        type=utf8_decoder,
+        help="the name of the contest",
+    )
+    export_scores_parser.add_argument(
+        "output_file",
+        help="csv where the score of each participation is written with format: (username, task scores..., total)",
+        metavar="output-file",
+    )
+
     args = parser.parse_args()
 
     if args.command == "import-teams":
-        teams = list(csv.reader(open(args.teams_file, "r")))
+        teams = read_csv(args.teams_file, TEAMS_SCHEMA)
         run_with_session(lambda session: import_teams(session, teams))
     elif args.command == "import-users":
-        users = list(csv.reader(open(args.users_file, "r")))
+        users = read_csv(args.users_file, USERS_SCHEMA)
         run_with_session(lambda session: import_users(session, users))
     elif args.command == "import-participations":
-        users = list(csv.reader(open(args.users_file, "r")))
+        users = read_csv(args.users_file, USERS_SCHEMA)
         run_with_session(
             lambda session: import_participations(session, users, args.contest)
         )
+    elif args.command == "export-teams":
+        run_with_session(lambda session: export_teams(session, args.output_file))
+    elif args.command == "export-users":
+        run_with_session(lambda session: export_users(session, args.output_file))
+    elif args.command == "export-participations":
+        run_with_session(
+            lambda session: export_participations(
+                session, args.output_file, args.contest
+            )
+        )
+    elif args.command == "export-scores":
+        run_with_session(
+            lambda session: export_scores(session, args.output_file, args.contest)
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import shutil
+from collections.abc import Iterable
+from pathlib import Path
+
+from credentials.types import User
+
+# Default upper bound for the total size of the cached PDFs.
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg) if xdg else Path.home() / ".cache"
+    return base / "credentials"
+
+
+def cache_key(
+    template: str,
+    version: str,
+    logo: Path,
+    phase: str,
+    users: Iterable[User],
+) -> str:
+    """Compute a key identifying the PDF generated from the given inputs.
+
+    `version` identifies what isn't in the template: the code rendering the users and
+    the compiler. Users are hashed in the order they are given because that's the order
+    in which they are printed in the PDF.
+    """
+    h = hashlib.sha256()
+    for part in (template, version, phase):
+        h.update(part.encode())
+        h.update(b"\0")
+    h.update(logo.read_bytes())
+    h.update(b"\0")
+    for u in users:
+        for field in (u.username, u.password, u.first_name, u.last_name):
+            h.update(field.encode())
+            h.update(b"\0")
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+class PdfCache:
+    """A content-addressed cache of generated PDFs.
+
+    Entries are evicted in least recently used order (tracked through the files'
+    modification time) once the total size of the cache exceeds `max_size` bytes.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        self._path = path or default_cache_dir()
+        self._max_size = max_size
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def fetch(self, key: str, target: Path) -> bool:
+        """Copy the entry for `key` into `target`. Return whether the entry was found."""
+        entry = self._entry(key)
+        if not entry.exists():
+            return False
+        entry.touch()
+        _link_or_copy(entry, target)
+        return True
+
+    def store(self, key: str, source: Path) -> None:
+        self._path.mkdir(parents=True, exist_ok=True)
+        entry = self._entry(key)
+        tmp = entry.with_suffix(".tmp")
+        shutil.copyfile(source, tmp)
+        tmp.replace(entry)
+        self._evict()
+
+    def _entry(self, key: str) -> Path:
+        return self._path / f"{key}.pdf"
+
+    def _evict(self) -> None:
+        entries = [(p, p.stat()) for p in self._path.glob("*.pdf")]
+        total = sum(st.st_size for _, st in entries)
+        entries.sort(key=lambda e: e[1].st_mtime)
+        for p, st in entries:
+            if total <= self._max_size:
+                break
+            p.unlink(missing_ok=True)
+            total -= st.st_size
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    # Remove the target first so we never write through a hard link into the cache.
+    target.unlink(missing_ok=True)
+    try:
+        target.hardlink_to(source)
+    except OSError:
+        shutil.copyfile(source, target)
@@ -5,6 +5,7 @@ import subprocess
 import tempfile
 from pathlib import Path
 
+from credentials.cache import PdfCache, cache_key
 from credentials.types import User
 
 HEADER = string.Template(
@@ -39,10 +40,38 @@ FOOTER = r"""
 \end{document}
 """
 
+# Version of the entries generated for the users in `generate_pdf`. It's part of the
+# cache key, so bump it whenever they change.
+FORMAT_VERSION = 1
+
+
+def generate_pdf(
+    phase: str,
+    users: list[User],
+    name: str,
+    cache: PdfCache | None = None,
+) -> bool:
+    """Generate `{name}.pdf`. Return whether the PDF had to be compiled.
+
+    If a `cache` is given and it contains a PDF generated from the same inputs, the
+    cached PDF is used instead of compiling it again.
+    """
+    logo = Path(__file__).parent / "logo.eps"
+    output = Path(f"{name}.pdf")
+    key = None
+    if cache is not None:
+        key = cache_key(
+            HEADER.template + FOOTER,
+            str(FORMAT_VERSION),
+            logo,
+            phase,
+            users,
+        )
+        if cache.fetch(key, output):
+            return False
 
-def generate_pdf(phase: str, users: list[User], name: str) -> None:
     with tempfile.TemporaryDirectory() as tempdir:
-        shutil.copy(Path(__file__).parent / "logo.eps", Path(tempdir) / "logo.eps")
+        shutil.copy(logo, Path(tempdir) / "logo.eps")
 
         texfile_path = Path(tempdir) / "main.tex"
         with texfile_path.open(mode="w") as texfile:
@@ -59,4 +88,10 @@ def generate_pdf(phase: str, users: list[User], name: str) -> None:
         os.chdir(tempdir)
         subprocess.check_call(["pdflatex", "main.tex"])
         os.chdir(cwd)
-        shutil.move(Path(tempdir) / "main.pdf", f"{name}.pdf")
+        pdf = Path(tempdir) / "main.pdf"
+        if cache is not None and key is not None:
+            cache.store(key, pdf)
+        # The output may be a hard link into the cache from a previous run.
+        output.unlink(missing_ok=True)
+        shutil.move(pdf, output)
+    return True
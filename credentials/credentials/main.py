@@ -1,7 +1,5 @@
-import csv
 import datetime
 from collections.abc import Callable, Iterable
-from io import StringIO
 from pathlib import Path
 from typing import ClassVar
 
@@ -23,8 +21,11 @@ from textual.widgets import (
     Switch,
 )
 
+from csv_ingest import TableCache, load, read_rows
+
 from credentials import typstgen
-from credentials.types import Keys, User
+from credentials.cache import PdfCache
+from credentials.types import SCHEMA, Keys, User
 from credentials.vim import VimDataTable, VimDirectoryTree
 
 HEADER_NAMES: dict[Keys, str] = {
@@ -145,6 +146,8 @@ class Credentials(App[None]):
             id="phase",
         )
         self._group_by_site = True
+        self._pdf_cache = PdfCache()
+        self._table_cache = TableCache()
 
     def on_mount(self) -> None:
         self._table.headers = self._get_headers()
@@ -180,7 +183,7 @@ class Credentials(App[None]):
     async def action_open_csv_file(self) -> None:
         path = await self.push_screen(FilePicker(), wait_for_dismiss=True)
         if path:
-            self._update_data(_read_csv_file(path))
+            self._update_data(_read_csv_file(path, self._table_cache))
 
     def on_paste(self, ev: Paste) -> None:
         self._update_data(_read_csv_from_paste(ev.text))
@@ -222,10 +225,12 @@ class Credentials(App[None]):
         with self.suspend():
             n = len(groups)
             try:
+                compiled = 0
                 for name, users in groups.items():
-                    typstgen.generate_pdf(phase, users, name)
+                    if typstgen.generate_pdf(phase, users, name, self._pdf_cache):
+                        compiled += 1
                 self.notify(
-                    f"{n} {_pluralize("PDF", n)} successfully generated",
+                    f"{n} {_pluralize("PDF", n)} successfully generated ({n - compiled} from cache)",
                 )
             except Exception as exc:
                 self.notify(
@@ -257,28 +262,19 @@ def _delete_column[T](data: list[list[T]], col: int) -> list[list[T]]:
     return [row[:col] + row[col + 1 :] for row in data]
 
 
-def _read_csv_file(path: Path) -> list[list[str]] | Exception:
+def _read_csv_file(
+    path: Path,
+    cache: TableCache | None = None,
+) -> list[list[str]] | Exception:
     try:
-        with path.open() as csvfile:
-            reader = csv.reader(csvfile)
-            return list(reader)
+        return load(path, SCHEMA, cache).rows
     except Exception as e:
         return e
 
 
 def _read_csv_from_paste(text: str) -> list[list[str]] | Exception:
     try:
-        csvfile = StringIO(text)
-
-        sample = csvfile.read(1024)
-        csvfile.seek(0)
-
-        sniffer = csv.Sniffer()
-        dialect = sniffer.sniff(sample)
-        csvfile.seek(0)
-
-        reader = csv.reader(csvfile, dialect)
-        return list(reader)
+        return list(read_rows(text, SCHEMA))
     except Exception as e:
         return e
 
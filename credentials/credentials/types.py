@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from enum import Enum
 
+from csv_ingest import Schema
+
 
 class Keys(Enum):
     username = 0
@@ -10,6 +12,21 @@ class Keys(Enum):
     site = 4
 
 
+# Maps the columns of a csv with a header to the layout of `Keys`
+SCHEMA = Schema(
+    fields=tuple(k.name for k in Keys),
+    aliases={
+        "username": ("usuario", "user", "login"),
+        "password": ("contraseña", "clave"),
+        "first_name": ("nombre", "nombres", "first names"),
+        "last_name": ("apellido", "apellidos", "last names"),
+        "site": ("sede",),
+    },
+    # The site is only needed when grouping by site
+    required=4,
+)
+
+
 @dataclass(kw_only=True, frozen=True)
 class User:
     username: str
@@ -1,10 +1,12 @@
 import shutil
 import string
 import tempfile
+from importlib.metadata import version
 from pathlib import Path
 
 import typst
 
+from credentials.cache import PdfCache, cache_key
 from credentials.types import User
 
 TEMPLATE = string.Template("""
@@ -42,8 +44,36 @@ TEMPLATE = string.Template("""
 $entries
 """)
 
+# Version of the entries generated for the users in `generate_pdf`. It's part of the
+# cache key, so bump it whenever they change.
+FORMAT_VERSION = 1
+
+
+def generate_pdf(
+    phase: str,
+    users: list[User],
+    name: str,
+    cache: PdfCache | None = None,
+) -> bool:
+    """Generate `{name}.pdf`. Return whether the PDF had to be compiled.
+
+    If a `cache` is given and it contains a PDF generated from the same inputs, the
+    cached PDF is used instead of compiling it again.
+    """
+    logo = Path(__file__).parent / "logo.png"
+    output = Path(f"{name}.pdf")
+    key = None
+    if cache is not None:
+        key = cache_key(
+            TEMPLATE.template,
+            f"{FORMAT_VERSION} typst {version('typst')}",
+            logo,
+            phase,
+            users,
+        )
+        if cache.fetch(key, output):
+            return False
 
-def generate_pdf(phase: str, users: list[User], name: str) -> None:
     with tempfile.TemporaryDirectory() as tempdir:
         entries = ""
         for u in users:
@@ -54,6 +84,13 @@ def generate_pdf(phase: str, users: list[User], name: str) -> None:
         path = Path(tempdir) / "main.typ"
         with path.open(mode="w") as typstfile:
             typstfile.write(TEMPLATE.substitute({"phase": phase, "entries": entries}))
-        shutil.copy(Path(__file__).parent / "logo.png", Path(tempdir) / "logo.png")
+        shutil.copy(logo, Path(tempdir) / "logo.png")
 
-        typst.compile(path, output=Path(f"{name}.pdf"))
+        pdf = Path(tempdir) / "main.pdf"
+        typst.compile(path, output=pdf)
+        if cache is not None and key is not None:
+            cache.store(key, pdf)
+        # The output may be a hard link into the cache from a previous run.
+        output.unlink(missing_ok=True)
+        shutil.copyfile(pdf, output)
+    return True
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import itertools
+import unicodedata
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+
+# Number of characters used to detect the dialect and the header
+SAMPLE_SIZE = 1024
+
+# Delimiters considered when detecting the dialect. Without restricting them the
+# sniffer picks letters as delimiters in data with a single column.
+DELIMITERS = ",;\t|"
+
+
+def detect_encoding(data: bytes) -> str:
+    """Guess the encoding of `data`.
+
+    A BOM wins, then UTF-8 if the data is valid UTF-8. Otherwise the data most likely
+    comes from a spreadsheet exported with a Windows locale.
+    """
+    if data.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    for encoding in ["utf-8", "cp1252"]:
+        try:
+            data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    # Every byte sequence is valid latin-1
+    return "latin-1"
+
+
+def decode(data: bytes) -> str:
+    return data.decode(detect_encoding(data))
+
+
+def sniff_dialect(sample: str) -> type[csv.Dialect] | csv.Dialect:
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=DELIMITERS)
+    except csv.Error:
+        pass
+    # The sniffer gives up if rows have a different number of columns, fall back to
+    # the most common delimiter in the first line (if any).
+    first = sample.partition("\n")[0]
+    delimiter = max(DELIMITERS, key=first.count)
+    if first.count(delimiter) == 0:
+        return csv.excel
+
+    class Dialect(csv.excel):
+        pass
+
+    Dialect.delimiter = delimiter
+    return Dialect
+
+
+@dataclass(frozen=True)
+class Schema:
+    """Columns expected by a tool, in order, and the header names accepted for them.
+
+    Fields after the first `required` ones may be missing from the input, in which case
+    they are filled with an empty string.
+    """
+
+    fields: tuple[str, ...]
+    aliases: Mapping[str, tuple[str, ...]] = field(
+        default_factory=dict[str, tuple[str, ...]],
+    )
+    required: int | None = None
+
+    def column_map(self, header: list[str]) -> list[int | None] | None:
+        """Map each field to its column in `header`, or None if `header` doesn't match."""
+        columns = {_normalize(name): i for i, name in enumerate(header)}
+        mapping: list[int | None] = []
+        for f in self.fields:
+            names = [_normalize(n) for n in [f, *self.aliases.get(f, ())]]
+            mapping.append(next((columns[n] for n in names if n in columns), None))
+        required = len(self.fields) if self.required is None else self.required
+        if any(i is None for i in mapping[:required]):
+            return None
+        return mapping
+
+
+class Rows(Iterable[list[str]]):
+    """Rows parsed incrementally from some lines.
+
+    Only the first lines are buffered to detect the dialect and the header. If a
+    `schema` is given and the first row is a header matching it, the header is skipped
+    and the rest of the rows are reordered to the layout of the schema. Otherwise rows
+    are returned as they are.
+    """
+
+    def __init__(self, lines: Iterable[str], schema: Schema | None = None) -> None:
+        lines = iter(lines)
+        sample: list[str] = []
+        size = 0
+        for line in lines:
+            sample.append(line)
+            size += len(line)
+            if size >= SAMPLE_SIZE:
+                break
+
+        self._dialect = sniff_dialect("".join(sample))
+        self._reader = csv.reader(itertools.chain(sample, lines), self._dialect)
+        self._header: list[str] | None = None
+        self._mapping: list[int | None] | None = None
+        self._pending: list[str] | None = None
+
+        first = next(self._reader, None)
+        if first is None:
+            return
+        if schema is not None:
+            self._mapping = schema.column_map(first)
+        if self._mapping is not None:
+            self._header = first
+        else:
+            self._pending = first
+            if _has_header("".join(sample)):
+                self._header = first
+
+    @property
+    def dialect(self) -> type[csv.Dialect] | csv.Dialect:
+        return self._dialect
+
+    @property
+    def header(self) -> list[str] | None:
+        """The first row if it looks like a header."""
+        return self._header
+
+    @property
+    def mapped(self) -> bool:
+        """Whether the rows are being reordered to the layout of the schema."""
+        return self._mapping is not None
+
+    def __iter__(self) -> Iterator[list[str]]:
+        """Iterate over the rows. Rows can only be iterated once."""
+        first = [self._pending] if self._pending is not None else []
+        self._pending = None
+        rows = itertools.chain(first, self._reader)
+        if self._mapping is None:
+            return rows
+        return remap(rows, self._mapping)
+
+
+def remap(
+    rows: Iterable[list[str]],
+    mapping: list[int | None],
+) -> Iterator[list[str]]:
+    """Reorder rows with a mapping returned by `Schema.column_map`."""
+    return (
+        [row[i] if i is not None and i < len(row) else "" for i in mapping]
+        for row in rows
+    )
+
+
+def read_rows(source: str | Iterable[str], schema: Schema | None = None) -> Rows:
+    """Parse rows from a text (e.g., pasted in a terminal) or an iterable of lines."""
+    if isinstance(source, str):
+        source = source.splitlines(keepends=True)
+    return Rows(source, schema)
+
+
+def _has_header(sample: str) -> bool:
+    try:
+        return csv.Sniffer().has_header(sample)
+    except csv.Error:
+        return False
+
+
+def _normalize(name: str) -> str:
+    # Compare header names ignoring case, accents, spaces and underscores
+    decomposed = unicodedata.normalize("NFKD", name.strip().lower())
+    return "".join(
+        c for c in decomposed if c.isalnum() and not unicodedata.combining(c)
+    )
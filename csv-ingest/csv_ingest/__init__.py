@@ -0,0 +1,15 @@
+"""Read rosters and other CSV-like data detecting their encoding, dialect and header."""
+
+from csv_ingest.reader import Rows, Schema, decode, detect_encoding, read_rows
+from csv_ingest.table import Table, TableCache, load
+
+__all__ = [
+    "Rows",
+    "Schema",
+    "Table",
+    "TableCache",
+    "decode",
+    "detect_encoding",
+    "load",
+    "read_rows",
+]
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+
+from csv_ingest import reader
+from csv_ingest.reader import Schema, decode, read_rows, remap
+
+# Maximum number of parsed files kept in the cache
+DEFAULT_MAX_ENTRIES = 64
+
+
+def default_cache_dir() -> Path:
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg) if xdg else Path.home() / ".cache"
+    return base / "csv-ingest"
+
+
+@dataclass
+class Table:
+    # The header of the file if it matched the schema (rows are then in the layout of
+    # the schema) or if it was detected as such.
+    header: list[str] | None
+    rows: list[list[str]]
+
+
+class TableCache:
+    """Parsed files keyed by their content.
+
+    Rows are stored as parsed, before applying a schema, so tools reading the same file
+    with different schemas share the entry. Entries are stored in a compact form that is fast to load: rows are pickled as
+    tuples and repeated cells (e.g., sites or teams) are stored once. Entries are
+    evicted in least recently used order.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self._path = path or default_cache_dir()
+        self._max_entries = max_entries
+
+    def fetch(self, key: str) -> Table | None:
+        entry = self._entry(key)
+        try:
+            with entry.open("rb") as f:
+                header, rows = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, ValueError):
+            return None
+        entry.touch()
+        return Table(header=header, rows=[list(row) for row in rows])
+
+    def store(self, key: str, table: Table) -> None:
+        # Make equal cells the same object so pickle writes each of them only once
+        interned: dict[str, str] = {}
+        rows = tuple(
+            tuple(interned.setdefault(cell, cell) for cell in row) for row in table.rows
+        )
+        try:
+            self._path.mkdir(parents=True, exist_ok=True)
+            entry = self._entry(key)
+            tmp = entry.with_suffix(".tmp")
+            with tmp.open("wb") as f:
+                pickle.dump((table.header, rows), f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp.replace(entry)
+            self._evict()
+        except OSError:
+            pass
+
+    def _entry(self, key: str) -> Path:
+        return self._path / f"{key}.pickle"
+
+    def _evict(self) -> None:
+        entries = sorted(self._path.glob("*.pickle"), key=lambda p: p.stat().st_mtime)
+        for p in entries[: max(0, len(entries) - self._max_entries)]:
+            p.unlink(missing_ok=True)
+
+
+def load(
+    path: Path,
+    schema: Schema | None = None,
+    cache: TableCache | None = None,
+) -> Table:
+    """Read a csv file detecting its encoding, dialect and header.
+
+    If a `cache` is given, a file that was already parsed (by any tool, with any
+    schema) is not parsed again. The schema is applied to the cached rows.
+    """
+    data = path.read_bytes()
+    table = None
+    key = None
+    if cache is not None:
+        # The encoding, dialect and header are detected from the content, so the
+        # content and the version of the parser determine the parsed rows.
+        h = hashlib.sha256(data)
+        h.update(b"\0")
+        h.update(_parser_version().encode())
+        key = h.hexdigest()
+        table = cache.fetch(key)
+    if table is None:
+        rows = read_rows(decode(data))
+        table = Table(header=rows.header, rows=list(rows))
+        if cache is not None and key is not None:
+            cache.store(key, table)
+    return _apply(table, schema)
+
+
+def _apply(table: Table, schema: Schema | None) -> Table:
+    """Reorder the rows of a table parsed without a schema to the layout of `schema`.
+
+    Like `read_rows` does with a schema, a first row matching it is taken as the header.
+    """
+    if schema is None or not table.rows:
+        return table
+    mapping = schema.column_map(table.rows[0])
+    if mapping is None:
+        return table
+    return Table(header=table.rows[0], rows=list(remap(table.rows[1:], mapping)))
+
+
+@functools.cache
+def _parser_version() -> str:
+    h = hashlib.sha256()
+    for module in [__file__, reader.__file__]:
+        h.update(Path(module).read_bytes())
+    return h.hexdigest()
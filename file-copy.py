@@ -1,31 +1,186 @@
 #!/usr/bin/python3
 
 import argparse
+import hashlib
+import os
 import re
 import glob
 import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 from pathlib import Path
 
 
+def plan_copy(in_path, out_path):
+    """Return the (source, target) of every testcase."""
+    regex = re.compile(r"(\d+)-(.+).txt")
+
+    plan = []
+    for file in sorted(Path(in_path).glob("**/*")):
+        ext = ".in" if file.parent.name == "in" else ".sol"
+        if m := regex.match(file.name):
+            st = int(m[1])
+            name = m[2]
+            plan.append((file, Path(out_path, f"st{st}", f"{name}{ext}")))
+    return plan
+
+
+def hash_file(file):
+    # Read in chunks so big testcases aren't loaded in memory at once
+    h = hashlib.sha256()
+    with file.open("rb") as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def copy_testcases(plan, dedup, jobs):
+    """Copy the testcases, hardlinking identical ones to a single copy if `dedup`.
+
+    Return the groups of targets with identical content.
+    """
+    hashes = [None] * len(plan)
+    if dedup:
+        # hashlib releases the GIL while hashing, so threads hash files in parallel
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            hashes = list(pool.map(hash_file, [source for source, _ in plan]))
+
+    stored = {}
+    groups = {}
+    for (source, target), digest in zip(plan, hashes):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # The target may be a hardlink left by a previous run, don't write through it
+        target.unlink(missing_ok=True)
+        if digest is not None and digest in stored:
+            try:
+                os.link(stored[digest], target)
+            except OSError:
+                # The filesystem doesn't support hardlinks
+                shutil.copy(source, target)
+            groups[digest].append(target)
+        else:
+            shutil.copy(source, target)
+            if digest is not None:
+                stored[digest] = target
+                groups[digest] = [target]
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def print_duplicates(groups):
+    saved = 0
+    for group in groups:
+        size = group[0].stat().st_size
+        saved += size * (len(group) - 1)
+        print(f"{len(group)} identical files ({size} bytes each):")
+        for target in group:
+            print(f"  {target}")
+    print(f"{len(groups)} groups of duplicates, {saved / 1024**2:.1f} MiB saved")
+
+
+def run_validator(validator, file, timeout):
+    """Run `validator <subtask>` with `file` as its standard input.
+
+    The file is handed to the validator as is, so it's never loaded in memory. Return
+    the status (pass, fail or timeout) and a message explaining a failure.
+    """
+    subtask = file.parent.name.removeprefix("st")
+    with file.open("rb") as f:
+        try:
+            proc = subprocess.run(
+                [validator, subtask],
+                stdin=f,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return "timeout", f"timed out after {timeout}s"
+    if proc.returncode == 0:
+        return "pass", ""
+    lines = proc.stderr.decode(errors="replace").strip().splitlines()
+    return "fail", lines[0] if lines else f"exit code {proc.returncode}"
+
+
+def validate(out_path, validator, timeout, jobs):
+    """Validate the inputs of every subtask in parallel and print a report.
+
+    Return whether all inputs are valid.
+    """
+    if shutil.which(validator) is None:
+        raise Exception(f"Cannot run validator `{validator}`")
+
+    def key(file):
+        return (int(file.parent.name.removeprefix("st")), file.name)
+
+    files = sorted(Path(out_path).glob("st[0-9]*/*.in"), key=key)
+    # Validators run in their own processes, threads just wait for them
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(lambda f: run_validator(validator, f, timeout), files))
+
+    summary = {}
+    failures = []
+    for file, (status, message) in zip(files, results):
+        counts = summary.setdefault(key(file)[0], {"pass": 0, "fail": 0, "timeout": 0})
+        counts[status] += 1
+        if status != "pass":
+            failures.append((file, status, message))
+
+    print(f"{'subtask':>8} {'inputs':>7} {'pass':>7} {'fail':>7} {'timeout':>7}")
+    for st, counts in summary.items():
+        total = sum(counts.values())
+        print(
+            f"{st:>8} {total:>7} {counts['pass']:>7} {counts['fail']:>7} "
+            f"{counts['timeout']:>7}"
+        )
+    for file, status, message in failures:
+        print(f"{status.upper()} {file}: {message}")
+    if not files:
+        print(f"No inputs found in `{out_path}`")
+    return not failures
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("in_path")
     parser.add_argument("out_path")
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="""store testcases with the same content once and hardlink the rest to it,
+        reporting the groups of duplicates""",
+    )
+    parser.add_argument(
+        "--validator",
+        help="""executable run on every input after copying. It's called with the subtask
+        number as argument and the input as standard input, and must exit with a non-zero
+        status (printing the reason to stderr) if the input is invalid""",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10,
+        help="seconds after which a validator run is killed and the input reported",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of files hashed or validators run in parallel",
+    )
 
     args = parser.parse_args()
 
-    regex = re.compile(r"(\d+)-(.+).txt")
-
-    for file in Path(args.in_path).glob("**/*"):
-        ext = ".in" if file.parent.name == "in" else ".sol"
-        if m := regex.match(file.name):
-            st = int(m[1])
-            name = m[2]
-            st_dir = Path(args.out_path, f"st{st}")
-            st_dir.mkdir(parents=True, exist_ok=True)
-            shutil.copy(file, Path(st_dir, f"{name}{ext}"))
+    plan = plan_copy(args.in_path, args.out_path)
+    duplicates = copy_testcases(plan, args.dedup, args.jobs)
+    if args.dedup:
+        print_duplicates(duplicates)
+    if args.validator:
+        if not validate(args.out_path, args.validator, args.timeout, args.jobs):
+            sys.exit(1)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,163 @@
+"""Build the images copied to the ranking.
+
+Flags are resized to the size the ranking needs and every image is recompressed
+losslessly. A sprite sheet with all the flags plus a CSS and a JSON index of their
+positions is built too, so a frontend serving the ranking can fetch a single image
+instead of one per team. Built images are cached by the hash of their source, so only
+new or changed images are built again.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import io
+import json
+import math
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Maximum width and height of a flag. Flags are shown small in the ranking, this keeps
+# them sharp in high density screens.
+FLAG_SIZE = 64
+
+# Directory (relative to the ranking dir) where the sprite sheet and its index go
+SPRITES_DIR = "sprites"
+
+
+@dataclass(frozen=True)
+class Bundle:
+    # Built files indexed by their path relative to the ranking dir
+    files: dict[str, Path]
+    # Total size of the source images, of the built ones and of the sprite sheet and its
+    # index, in bytes
+    source_size: int
+    size: int
+    sprites_size: int
+
+
+def build(sources: dict[str, Path], cache_dir: Path, size: int = FLAG_SIZE) -> Bundle:
+    """Build the images in `sources` (indexed by their path relative to the ranking dir).
+
+    Images under `flags/` are resized to fit in `size` x `size` pixels and packed in a
+    sprite sheet. The rest (e.g., the logo) are only recompressed.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    files: dict[str, Path] = {}
+    flags: dict[str, Path] = {}
+    for target, source in sorted(sources.items()):
+        is_flag = target.startswith("flags/")
+        data = source.read_bytes()
+        key = _key(data, str(size if is_flag else 0))
+        built = cache_dir / f"{key}.png"
+        if not built.exists():
+            _write(built, _optimize(data, size if is_flag else None))
+        files[target] = built
+        if is_flag:
+            flags[Path(target).stem] = built
+
+    sprites_size = 0
+    if flags:
+        key = _key(str(size), *(f"{name}={path.stem}" for name, path in flags.items()))
+        sprites = cache_dir / f"sprites-{key}"
+        if not sprites.exists():
+            _build_sprites(flags, sprites, size)
+        for f in sorted(sprites.iterdir()):
+            files[f"{SPRITES_DIR}/{f.name}"] = f
+            sprites_size += f.stat().st_size
+
+    return Bundle(
+        files=files,
+        source_size=sum(p.stat().st_size for p in sources.values()),
+        size=sum(p.stat().st_size for p in files.values()) - sprites_size,
+        sprites_size=sprites_size,
+    )
+
+
+def _optimize(data: bytes, size: int | None) -> bytes:
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        if size is not None:
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        optimized = _png(img)
+    # Recompressing (or even downscaling) an already optimized image may not pay off,
+    # keep the original then. The ranking sets the size it shows flags at anyway.
+    if len(optimized) >= len(data) and data.startswith(b"\x89PNG"):
+        return data
+    return optimized
+
+
+def _build_sprites(flags: dict[str, Path], target: Path, size: int) -> None:
+    from PIL import Image
+
+    images: dict[str, Image.Image] = {}
+    for name, path in flags.items():
+        with Image.open(path) as img:
+            # Built flags may have kept their original size
+            images[name] = img.convert("RGBA")
+            images[name].thumbnail((size, size), Image.Resampling.LANCZOS)
+    cell = max(max(img.size) for img in images.values())
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    sheet = Image.new("RGBA", (columns * cell, rows * cell))
+    index: dict[str, dict[str, int]] = {}
+    css = [
+        (
+            ".flag { display: inline-block; background-image: url(flags.png); "
+            "background-repeat: no-repeat; }"
+        ),
+    ]
+    for i, (name, img) in enumerate(images.items()):
+        x, y = (i % columns) * cell, (i // columns) * cell
+        sheet.paste(img, (x, y))
+        w, h = img.size
+        index[name] = {"x": x, "y": y, "width": w, "height": h}
+        css.append(
+            f".flag-{_css_name(name)} {{ background-position: -{x}px -{y}px; "
+            f"width: {w}px; height: {h}px; }}",
+        )
+
+    # Build in a temporary directory so an interrupted build is never reused
+    tmp = target.with_suffix(".tmp")
+    tmp.mkdir(parents=True, exist_ok=True)
+    _write(tmp / "flags.png", _png(sheet))
+    (tmp / "flags.json").write_text(json.dumps(index, indent=2) + "\n")
+    (tmp / "flags.css").write_text("\n".join(css) + "\n")
+    tmp.replace(target)
+
+
+def _png(img: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    # Metadata chunks are dropped since they are not copied unless asked for
+    img.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _write(path: Path, data: bytes) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def _css_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]", "_", name)
+
+
+def _key(*parts: bytes | str) -> str:
+    h = hashlib.sha256(_version().encode())
+    for part in parts:
+        h.update(b"\0")
+        h.update(part.encode() if isinstance(part, str) else part)
+    return h.hexdigest()[:32]
+
+
+@functools.cache
+def _version() -> str:
+    # Images built by a different version of this module are built again
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
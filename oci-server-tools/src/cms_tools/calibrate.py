@@ -0,0 +1,144 @@
+"""Calibrate the speed of the hosts that evaluate submissions.
+
+A small C++ program with single-thread CPU and memory benchmarks is compiled and run in
+every host with the same compiler used for submissions. Hosts whose timings deviate from
+the median of the cluster are flagged, since the same time limit would not be equally
+strict in them.
+"""
+
+from __future__ import annotations
+
+import statistics
+from dataclasses import dataclass
+
+# Benchmarks in the order they are reported and a short description of each of them
+BENCHMARKS = {
+    "int": "integer arithmetic",
+    "sort": "std::sort of 4M ints",
+    "latency": "random memory accesses over 256 MiB",
+    "bandwidth": "sequential copy of 256 MiB",
+}
+
+_SOURCE = r"""
+#include <algorithm>
+#include <chrono>
+#include <cstdint>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <numeric>
+#include <random>
+#include <vector>
+
+using namespace std;
+
+static volatile uint64_t sink;
+
+template <class F> double best(int repeat, F f) {
+  double best = 1e9;
+  for (int i = 0; i < repeat; i++) {
+    auto start = chrono::steady_clock::now();
+    f();
+    chrono::duration<double> elapsed = chrono::steady_clock::now() - start;
+    best = min(best, elapsed.count());
+  }
+  return best;
+}
+
+int main(int argc, char **argv) {
+  int repeat = argc > 1 ? atoi(argv[1]) : 3;
+
+  printf("int %.6f\n", best(repeat, [] {
+    uint64_t x = 88172645463325252ull, acc = 0;
+    for (int i = 0; i < 200000000; i++) {
+      x ^= x << 13; x ^= x >> 7; x ^= x << 17;
+      acc += x % 1000003;
+    }
+    sink = acc;
+  }));
+
+  printf("sort %.6f\n", best(repeat, [] {
+    mt19937 rng(42);
+    vector<int> v(1 << 22);
+    for (int &x : v) x = rng();
+    sort(v.begin(), v.end());
+    sink = v[v.size() / 2];
+  }));
+
+  // Random cyclic permutation so every access depends on the previous one
+  size_t n = (256u << 20) / sizeof(uint32_t);
+  vector<uint32_t> next(n);
+  iota(next.begin(), next.end(), 0);
+  mt19937 rng(7);
+  for (size_t i = n - 1; i > 0; i--) swap(next[i], next[rng() % i]);
+  printf("latency %.6f\n", best(repeat, [&] {
+    uint32_t p = 0;
+    for (int i = 0; i < 2000000; i++) p = next[p];
+    sink = p;
+  }));
+
+  vector<char> src(256u << 20, 1), dst(256u << 20);
+  printf("bandwidth %.6f\n", best(repeat, [&] {
+    for (int i = 0; i < 4; i++) {
+      memcpy(dst.data(), src.data(), src.size());
+      src[i] = dst[src.size() - 1 - i];
+    }
+    sink = dst[12345];
+  }));
+  return 0;
+}
+"""
+
+
+def script(repeat: int) -> str:
+    """Build a bash script compiling and running the benchmarks in a temporary directory."""
+    return (
+        "set -e\n"
+        'dir="$(mktemp -d)"\n'
+        "trap 'rm -rf \"$dir\"' EXIT\n"
+        "cat > \"$dir/calibrate.cpp\" <<'CMS_TOOLS_EOF'\n"
+        f"{_SOURCE.strip()}\n"
+        "CMS_TOOLS_EOF\n"
+        'g++ -O2 -std=c++17 -o "$dir/calibrate" "$dir/calibrate.cpp"\n'
+        f'"$dir/calibrate" {repeat}\n'
+    )
+
+
+def parse(output: str) -> dict[str, float]:
+    """Parse the output of the benchmarks into seconds per benchmark."""
+    results: dict[str, float] = {}
+    for line in output.splitlines():
+        name, _, seconds = line.partition(" ")
+        if name in BENCHMARKS:
+            results[name] = float(seconds)
+    missing = BENCHMARKS.keys() - results.keys()
+    if missing:
+        raise ValueError(
+            f"missing results for {', '.join(sorted(missing))}: {output!r}",
+        )
+    return results
+
+
+@dataclass(frozen=True)
+class Deviation:
+    benchmark: str
+    # Relative difference with the median of all hosts, positive if slower
+    relative: float
+
+
+def deviations(
+    results: dict[str, dict[str, float]],
+    threshold: float,
+) -> dict[str, list[Deviation]]:
+    """Find the benchmarks in which each host deviates from the median by more than `threshold`.
+
+    Hosts that are faster are flagged too, the goal is for all hosts to be equal.
+    """
+    flagged: dict[str, list[Deviation]] = {host: [] for host in results}
+    for benchmark in BENCHMARKS:
+        median = statistics.median(r[benchmark] for r in results.values())
+        for host, r in results.items():
+            relative = r[benchmark] / median - 1
+            if abs(relative) > threshold:
+                flagged[host].append(Deviation(benchmark, relative))
+    return flagged
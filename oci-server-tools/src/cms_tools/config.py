@@ -0,0 +1,184 @@
+"""Host configuration file (conf.yaml) and its validation.
+
+Validating the configuration requires importing pydantic and ruamel.yaml, which
+dominates the startup time of cms-tools. To keep interactive commands fast the
+validated configuration is cached (pickled) and reused while the configuration file
+doesn't change.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import os
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(kw_only=True)
+class Config:
+    secret_key: str
+    identity_file: str
+    cms_dir: str
+    main: MainHostConfig
+    workers: list[HostConfig]
+    rankings: list[str]
+
+    def __post_init__(self) -> None:
+        # Ports of the other web servers running in the main host
+        taken = {
+            self.main.admin_web_server.listen_port: "the admin web server",
+            **dict.fromkeys(
+                local_ranking_ports(self.rankings, self.main.ip),
+                "a ranking",
+            ),
+        }
+        cws = self.main.contest_web_server
+        if cws.listen_port is None:
+            # Consecutive ports from 8888, skipping the ones already taken
+            ports = (p for p in itertools.count(8888) if p not in taken)
+            cws.listen_port = list(itertools.islice(ports, len(cws.listen_address)))
+        for port in cws.listen_port:
+            if port in taken:
+                raise ValueError(
+                    f"contest_web_server.listen_port uses port {port}, which is the "
+                    f"port of {taken[port]}",
+                )
+
+
+@dataclass(kw_only=True)
+class HostConfig:
+    ip: str
+    workers: int
+    ssh: SSHConf
+
+
+@dataclass(kw_only=True)
+class MainHostConfig(HostConfig):
+    db: DBConf
+    admin_web_server: AdminWebServer
+    contest_web_server: ContestWebServer
+
+
+@dataclass(kw_only=True)
+class AdminWebServer:
+    listen_address: str
+    listen_port: int = 8889
+
+
+@dataclass(kw_only=True)
+class ContestWebServer:
+    listen_address: list[str]
+    listen_port: list[int] | None = None
+
+    def __post_init__(self) -> None:
+        if self.listen_port is not None and len(self.listen_port) != len(
+            self.listen_address,
+        ):
+            raise ValueError(
+                "contest_web_server.listen_port must have one port per listen_address",
+            )
+
+    @property
+    def ports(self) -> list[int]:
+        # Filled by `Config` when omitted
+        assert self.listen_port is not None
+        return self.listen_port
+
+
+@dataclass(kw_only=True)
+class DBConf:
+    name: str
+    username: str
+    password: str
+    port: int
+
+
+@dataclass(kw_only=True)
+class SSHConf:
+    ip: str
+    username: str
+
+
+def local_ranking_ports(rankings: list[str], main_ip: str) -> list[int]:
+    """Return the ports of the rankings running in the main host."""
+    from urllib.parse import urlsplit
+
+    ports: list[int] = []
+    for ranking in rankings:
+        url = urlsplit(ranking)
+        if url.hostname in ["localhost", "127.0.0.1", main_ip] and url.port:
+            ports.append(url.port)
+    return ports
+
+
+def default_cache_dir() -> Path:
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg) if xdg else Path.home() / ".cache"
+    return base / "cms-tools"
+
+
+def load_config(path: Path, cache_dir: Path | None = None) -> Config:
+    """Load and validate the configuration file in `path`.
+
+    The validated configuration is cached in `cache_dir` keyed by the modification
+    time and hash of the file. The cache is also invalidated if this module changes.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    name = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:16]
+    cache = cache_dir / f"conf-{name}.pickle"
+    mtime = path.stat().st_mtime_ns
+    version = _schema_version()
+
+    cached = _read_cache(cache)
+    if cached is not None and cached[0] == version and cached[1] == mtime:
+        return cached[3]
+
+    content = path.read_bytes()
+    digest = hashlib.sha256(content).hexdigest()
+    if cached is not None and cached[0] == version and cached[2] == digest:
+        conf = cached[3]
+    else:
+        conf = validate_config(content)
+    _write_cache(cache, (version, mtime, digest, conf))
+    return conf
+
+
+def validate_config(content: bytes) -> Config:
+    import json
+
+    from pydantic import TypeAdapter
+    from ruamel.yaml import YAML
+
+    data = YAML(typ="safe").load(content)  # pyright: ignore[reportUnknownMemberType]
+    # Validating JSON in strict mode accepts objects for dataclasses and has the same
+    # type strictness as the values produced by the YAML safe loader.
+    return TypeAdapter(Config).validate_json(json.dumps(data), strict=True)
+
+
+type _CacheEntry = tuple[str, int, str, Config]
+
+
+def _schema_version() -> str:
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+def _read_cache(cache: Path) -> _CacheEntry | None:
+    try:
+        with cache.open("rb") as f:
+            entry = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError):
+        return None
+    return entry
+
+
+def _write_cache(cache: Path, entry: _CacheEntry) -> None:
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(cache)
+    except OSError:
+        pass
@@ -0,0 +1,75 @@
+"""Bundle the steps needed to bring up CMS in a host into a single remote script.
+
+Each step is a snippet of shell code. The steps of a host are rendered into one script
+that is executed through a single ssh connection, so deploying takes one round trip
+per host instead of one per step. Files (cms.toml, ranking images) are embedded in the
+script itself.
+"""
+
+from __future__ import annotations
+
+import shlex
+from dataclasses import dataclass
+from pathlib import Path
+
+# Steps in the order they run within a host
+STEPS = [
+    "conf",
+    "log-service",
+    "ranking-images",
+    "ranking",
+    "resource-service",
+]
+
+
+@dataclass(frozen=True)
+class Step:
+    name: str
+    script: str
+
+
+def write_file(name: str, path: Path, content: str) -> Step:
+    delimiter = "CMS_TOOLS_EOF"
+    if delimiter in content:
+        raise ValueError(f"cannot embed `{path}` in a script")
+    quoted = shlex.quote(str(path))
+    content = content.rstrip("\n")
+    return Step(
+        name,
+        f"mkdir -p {shlex.quote(str(path.parent))} && cat > {quoted} <<'{delimiter}'\n"
+        f"{content}\n"
+        f"{delimiter}",
+    )
+
+
+def extract_files(name: str, target_dir: Path, files: dict[str, Path]) -> Step:
+    """Ship `files` (a map from relative remote path to local path) as an embedded tarball."""
+    # Only needed when deploying ranking images, tarfile is slow to import
+    import base64
+    import io
+    import tarfile
+
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for arcname, path in sorted(files.items()):
+            tar.add(path, arcname=arcname)
+    payload = base64.encodebytes(buffer.getvalue()).decode()
+    target = shlex.quote(str(target_dir))
+    return Step(
+        name,
+        f"mkdir -p {target} && base64 -d <<'CMS_TOOLS_EOF' | tar -xz -C {target}\n"
+        f"{payload}"
+        "CMS_TOOLS_EOF",
+    )
+
+
+def render(steps: list[Step]) -> str:
+    """Render steps into a script that stops at the first failing step."""
+    lines = ["#!/bin/bash"]
+    for step in steps:
+        name = shlex.quote(step.name)
+        lines.append(f"echo '==>' {name}")
+        lines.append(
+            f"{{\n{step.script}\n}} || {{ echo 'step failed:' {name} >&2; exit 1; }}",
+        )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,98 @@
+"""Inspect and pin the settings of a host that affect the stability of timings.
+
+Frequency scaling, turbo boost, SMT siblings and swapping all make the time and memory
+used by a submission depend on what else is running in the host. Settings are changed
+at runtime through sysfs/procfs, so they don't persist across reboots.
+"""
+
+from __future__ import annotations
+
+import shlex
+from dataclasses import dataclass
+
+NOT_AVAILABLE = "n/a"
+
+# Prints one `setting=value` line per setting. Settings the host doesn't expose (e.g.,
+# cpufreq in some virtual machines) are reported as n/a.
+INSPECT_SCRIPT = r"""
+cpu=/sys/devices/system/cpu
+g=$(cat $cpu/cpu*/cpufreq/scaling_governor 2>/dev/null | sort -u | paste -sd, -)
+echo "governor=${g:-n/a}"
+if [ -f $cpu/intel_pstate/no_turbo ]; then
+  [ "$(cat $cpu/intel_pstate/no_turbo)" = 1 ] && echo turbo=off || echo turbo=on
+elif [ -f $cpu/cpufreq/boost ]; then
+  [ "$(cat $cpu/cpufreq/boost)" = 0 ] && echo turbo=off || echo turbo=on
+else
+  echo turbo=n/a
+fi
+case "$(cat $cpu/smt/control 2>/dev/null)" in
+  on) echo smt=on ;;
+  off|forceoff) echo smt=off ;;
+  *) echo smt=n/a ;;
+esac
+echo "swappiness=$(cat /proc/sys/vm/swappiness 2>/dev/null || echo n/a)"
+"""
+
+
+@dataclass(frozen=True)
+class TuningPolicy:
+    governor: str = "performance"
+    turbo: str = "off"
+    smt: str = "off"
+    swappiness: str = "0"
+
+    def settings(self) -> dict[str, str]:
+        return {
+            "governor": self.governor,
+            "turbo": self.turbo,
+            "smt": self.smt,
+            "swappiness": self.swappiness,
+        }
+
+    def apply_script(self) -> str:
+        """Build a script setting the values of the policy (requires passwordless sudo)."""
+        no_turbo = "1" if self.turbo == "off" else "0"
+        boost = "0" if self.turbo == "off" else "1"
+        return (
+            "cpu=/sys/devices/system/cpu\n"
+            # Skip settings the host doesn't expose or that already have the value, and
+            # keep going if one can't be set
+            'write() { [ -e "$2" ] || return 0; [ "$(cat "$2")" = "$1" ] && return 0; '
+            'echo "$1" | sudo -n tee "$2" >/dev/null || echo "cannot write $2" >&2; }\n'
+            # SMT first, since it changes the set of online cpus. It can only be
+            # changed if it's on or off (not if it's unsupported or forced off).
+            'case "$(cat $cpu/smt/control 2>/dev/null)" in on|off) '
+            f"write {self.smt} $cpu/smt/control ;; esac\n"
+            "for f in $cpu/cpu*/cpufreq/scaling_governor; do "
+            f'write {shlex.quote(self.governor)} "$f"; done\n'
+            f"write {no_turbo} $cpu/intel_pstate/no_turbo\n"
+            f"write {boost} $cpu/cpufreq/boost\n"
+            f"write {self.swappiness} /proc/sys/vm/swappiness\n"
+        )
+
+
+@dataclass(frozen=True)
+class Check:
+    setting: str
+    value: str
+    expected: str
+
+    @property
+    def compliant(self) -> bool:
+        return self.value in (self.expected, NOT_AVAILABLE)
+
+
+def parse(output: str) -> dict[str, str]:
+    values: dict[str, str] = {}
+    for line in output.splitlines():
+        setting, sep, value = line.partition("=")
+        if sep:
+            values[setting.strip()] = value.strip()
+    return values
+
+
+def check(values: dict[str, str], policy: TuningPolicy) -> list[Check]:
+    return [
+        Check(setting, values.get(setting, NOT_AVAILABLE), expected)
+        for setting, expected in policy.settings().items()
+    ]
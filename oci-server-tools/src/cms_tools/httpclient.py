@@ -0,0 +1,159 @@
+"""A minimal HTTP/1.1 client on top of asyncio streams.
+
+It's enough to talk to CMS's web servers without adding extra dependencies.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import contextlib
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass
+from urllib.parse import unquote, urlsplit
+
+
+class HTTPError(Exception):
+    pass
+
+
+@dataclass
+class Response:
+    status: int
+    headers: list[tuple[str, str]]
+    body: bytes
+
+    def header(self, name: str) -> str | None:
+        name = name.lower()
+        return next((v for k, v in self.headers if k == name), None)
+
+
+class Client:
+    """A minimal keep-alive HTTP/1.1 client with a cookie jar.
+
+    Credentials embedded in the base url are sent using basic authentication.
+    """
+
+    def __init__(self, base_url: str, timeout: float) -> None:
+        url = urlsplit(base_url)
+        if url.scheme not in ("http", "https"):
+            raise HTTPError(f"unsupported url `{base_url}`")
+        self._ssl = url.scheme == "https"
+        self._host = url.hostname or "localhost"
+        self._port = url.port or (443 if self._ssl else 80)
+        self._prefix = url.path.rstrip("/")
+        self._auth = None
+        if url.username is not None:
+            userinfo = f"{unquote(url.username)}:{unquote(url.password or '')}"
+            self._auth = base64.b64encode(userinfo.encode()).decode()
+        self._timeout = timeout
+        self._cookies: dict[str, str] = {}
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    def cookie(self, name: str) -> str | None:
+        return self._cookies.get(name)
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        body: bytes = b"",
+        content_type: str | None = None,
+    ) -> Response:
+        try:
+            return await asyncio.wait_for(
+                self._request(method, path, body, content_type),
+                self._timeout,
+            )
+        except (OSError, asyncio.IncompleteReadError, TimeoutError, ValueError) as exc:
+            await self.close()
+            raise HTTPError(f"{method} {path}: {exc!r}") from exc
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        body: bytes,
+        content_type: str | None,
+    ) -> Response:
+        if self._writer is None or self._writer.is_closing():
+            self._reader, self._writer = await asyncio.open_connection(
+                self._host,
+                self._port,
+                ssl=self._ssl or None,
+            )
+        reader, writer = self._reader, self._writer
+        assert reader is not None
+
+        lines = [
+            f"{method} {self._prefix}{path} HTTP/1.1",
+            f"Host: {self._host}:{self._port}",
+            f"Content-Length: {len(body)}",
+        ]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        if self._auth:
+            lines.append(f"Authorization: Basic {self._auth}")
+        if self._cookies:
+            cookies = "; ".join(f"{k}={v}" for k, v in self._cookies.items())
+            lines.append(f"Cookie: {cookies}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+        status_line = (await reader.readuntil(b"\r\n")).decode("latin-1")
+        status = int(status_line.split(" ", 2)[1])
+        headers: list[tuple[str, str]] = []
+        while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+            name, _, value = line.decode("latin-1").partition(":")
+            headers.append((name.strip().lower(), value.strip()))
+        response = Response(status, headers, b"")
+
+        if response.header("transfer-encoding") == "chunked":
+            chunks: list[bytes] = []
+            while size := int((await reader.readuntil(b"\r\n")).split(b";")[0], 16):
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            await reader.readuntil(b"\r\n")
+            response.body = b"".join(chunks)
+        elif (length := response.header("content-length")) is not None:
+            response.body = await reader.readexactly(int(length))
+        else:
+            response.body = await reader.read()
+            await self.close()
+
+        for name, value in headers:
+            if name == "set-cookie":
+                key, _, val = value.split(";", 1)[0].partition("=")
+                self._cookies[key.strip()] = val.strip()
+        if response.header("connection") == "close":
+            await self.close()
+        return response
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            with contextlib.suppress(OSError):
+                await self._writer.wait_closed()
+        self._reader = self._writer = None
+
+
+class ClientPool:
+    """A fixed size pool of keep-alive connections to the same server."""
+
+    def __init__(self, base_url: str, size: int, timeout: float) -> None:
+        self._clients = [Client(base_url, timeout) for _ in range(max(1, size))]
+        self._idle: asyncio.Queue[Client] = asyncio.Queue()
+        for client in self._clients:
+            self._idle.put_nowait(client)
+
+    @contextlib.asynccontextmanager
+    async def client(self) -> AsyncGenerator[Client]:
+        client = await self._idle.get()
+        try:
+            yield client
+        finally:
+            self._idle.put_nowait(client)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(c.close() for c in self._clients))
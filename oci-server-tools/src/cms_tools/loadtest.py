@@ -0,0 +1,393 @@
+"""A simple load generator for CMS's Contest Web Server.
+
+Each simulated contestant logs in with its own credentials and then performs actions
+(browsing, submissions and user tests) at a global configurable rate. The HTTP client
+is a minimal HTTP/1.1 implementation on top of asyncio streams so the command doesn't
+need any extra dependencies.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import random
+import secrets
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlencode
+
+from prettytable import PrettyTable
+
+from cms_tools.httpclient import Client, HTTPError, Response
+
+ACTIONS = ("browse", "submit", "test")
+
+
+@dataclass(frozen=True)
+class Credential:
+    username: str
+    password: str
+
+
+@dataclass(kw_only=True)
+class LoadTestOptions:
+    tasks: list[str]
+    # Total number of actions per second across all users
+    rate: float = 10.0
+    duration: float = 60.0
+    contest: str | None = None
+    language: str = "C++17 / g++"
+    submission_field: str = "{task}.%l"
+    submission: bytes = b"int main() { return 0; }\n"
+    test_input: bytes = b"1\n"
+    weights: dict[str, float] = field(
+        default_factory=lambda: {"browse": 0.8, "submit": 0.15, "test": 0.05},
+    )
+    timeout: float = 30.0
+
+
+@dataclass
+class ActionStats:
+    latencies: list[float] = field(default_factory=list[float])
+    errors: int = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies) + self.errors
+
+
+@dataclass
+class LoadTestResult:
+    # Duration of the actions phase and stats of each action. Logins happen before it,
+    # so they are kept apart and left out of the totals.
+    duration: float
+    stats: dict[str, ActionStats]
+    login_duration: float = 0.0
+    logins: ActionStats = field(default_factory=ActionStats)
+
+    @property
+    def requests(self) -> int:
+        return sum(s.count for s in self.stats.values())
+
+    @property
+    def errors(self) -> int:
+        return sum(s.errors for s in self.stats.values())
+
+    @property
+    def throughput(self) -> float:
+        """Successful requests per second.
+
+        Actions are released at a fixed rate, so counting failed requests would only
+        echo the rate.
+        """
+        ok = self.requests - self.errors
+        return ok / self.duration if self.duration > 0 else 0.0
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Summarize the latencies (in milliseconds) of logins, each action and overall.
+
+        The total only includes the actions.
+        """
+        summary = {"login": _summarize(self.logins, self.login_duration)}
+        everything = ActionStats()
+        for action, stats in sorted(self.stats.items()):
+            summary[action] = _summarize(stats, self.duration)
+            everything.latencies.extend(stats.latencies)
+            everything.errors += stats.errors
+        summary["total"] = _summarize(everything, self.duration)
+        return summary
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Return the `p`-th percentile of `values` using the nearest-rank method."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def _summarize(stats: ActionStats, duration: float) -> dict[str, float]:
+    ms = [lat * 1000 for lat in stats.latencies]
+    return {
+        "count": stats.count,
+        "errors": stats.errors,
+        "throughput": len(stats.latencies) / duration if duration > 0 else 0.0,
+        "error_rate": stats.errors / stats.count if stats.count else 0.0,
+        "p50": percentile(ms, 50),
+        "p90": percentile(ms, 90),
+        "p95": percentile(ms, 95),
+        "p99": percentile(ms, 99),
+        "max": max(ms, default=0.0),
+    }
+
+
+def read_users(path: Path) -> list[Credential]:
+    """Read users from a csv in the format expected by `cms-import.py import-users`."""
+    with path.open(newline="") as csvfile:
+        return [
+            Credential(username=row[0], password=row[1])
+            for row in csv.reader(csvfile)
+            if len(row) >= 2
+        ]
+
+
+def _multipart(
+    fields: dict[str, str],
+    files: dict[str, tuple[str, bytes]],
+) -> tuple[bytes, str]:
+    boundary = secrets.token_hex(16)
+    parts: list[bytes] = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode(),
+        )
+    for name, (filename, content) in files.items():
+        parts.append(
+            (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                "Content-Type: application/octet-stream\r\n\r\n"
+            ).encode()
+            + content
+            + b"\r\n",
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def _logged_in(response: Response) -> bool:
+    # CWS answers both successful and failed logins with a redirect, the latter to the
+    # login form with `login_error` set. Only a successful one sets the login cookie
+    # (named `<contest>_login`).
+    location = response.header("location") or ""
+    return (
+        response.status in (302, 303)
+        and "login_error" not in location
+        and any(
+            name == "set-cookie" and value.split("=", 1)[0].strip().endswith("_login")
+            for name, value in response.headers
+        )
+    )
+
+
+def _authenticated(response: Response) -> bool:
+    # Requests of users that aren't logged in are redirected to the login form, with the
+    # requested page in `next`.
+    location = response.header("location") or ""
+    if response.status in (301, 302, 303) and (
+        "next=" in location or "login_error" in location
+    ):
+        return False
+    return response.status < 400
+
+
+class Contestant:
+    """A simulated contestant interacting with a single Contest Web Server."""
+
+    def __init__(
+        self,
+        credential: Credential,
+        base_url: str,
+        options: LoadTestOptions,
+        result: LoadTestResult,
+    ) -> None:
+        self._credential = credential
+        self._options = options
+        self._result = result
+        prefix = f"/{options.contest}" if options.contest else ""
+        self._client = Client(base_url.rstrip("/") + prefix, options.timeout)
+
+    async def login(self) -> bool:
+        async def do_login() -> Response:
+            await self._client.request("GET", "/")
+            form = {
+                "username": self._credential.username,
+                "password": self._credential.password,
+                "next": "/",
+                "_xsrf": self._client.cookie("_xsrf") or "",
+            }
+            return await self._client.request(
+                "POST",
+                "/login",
+                urlencode(form).encode(),
+                "application/x-www-form-urlencoded",
+            )
+
+        return await self._timed(self._result.logins, do_login, ok=_logged_in)
+
+    async def act(self, action: str, released: float) -> None:
+        """Perform `action`, measuring its latency from `released`.
+
+        `released` is the time (as given by `time.perf_counter`) at which the action was
+        scheduled, so the time it waited for a free contestant is included.
+        """
+        task = random.choice(self._options.tasks)
+        stats = self._result.stats.setdefault(action, ActionStats())
+        match action:
+            case "browse":
+                page = random.choice(
+                    ["/", f"/tasks/{task}/description", f"/tasks/{task}/submissions"],
+                )
+                await self._timed(
+                    stats,
+                    lambda: self._client.request("GET", page),
+                    start=released,
+                )
+            case "submit":
+                await self._timed(stats, lambda: self._submit(task), start=released)
+            case "test":
+                await self._timed(stats, lambda: self._test(task), start=released)
+            case _:
+                raise ValueError(f"unknown action `{action}`")
+
+    async def close(self) -> None:
+        await self._client.close()
+
+    async def _submit(self, task: str) -> Response:
+        name = self._options.submission_field.format(task=task)
+        body, content_type = _multipart(
+            {
+                "_xsrf": self._client.cookie("_xsrf") or "",
+                "language": self._options.language,
+            },
+            {name: (name.replace("%l", "cpp"), self._options.submission)},
+        )
+        return await self._client.request(
+            "POST",
+            f"/tasks/{task}/submit",
+            body,
+            content_type,
+        )
+
+    async def _test(self, task: str) -> Response:
+        name = self._options.submission_field.format(task=task)
+        body, content_type = _multipart(
+            {
+                "_xsrf": self._client.cookie("_xsrf") or "",
+                "language": self._options.language,
+            },
+            {
+                name: (name.replace("%l", "cpp"), self._options.submission),
+                "input": ("input.txt", self._options.test_input),
+            },
+        )
+        return await self._client.request(
+            "POST",
+            f"/tasks/{task}/test",
+            body,
+            content_type,
+        )
+
+    async def _timed(
+        self,
+        stats: ActionStats,
+        f: Callable[[], Awaitable[Response]],
+        ok: Callable[[Response], bool] = _authenticated,
+        start: float | None = None,
+    ) -> bool:
+        if start is None:
+            start = time.perf_counter()
+        try:
+            response = await f()
+        except HTTPError:
+            stats.errors += 1
+            return False
+        if not ok(response):
+            stats.errors += 1
+            return False
+        stats.latencies.append(time.perf_counter() - start)
+        return True
+
+
+async def run_load_test(
+    targets: list[str],
+    users: list[Credential],
+    options: LoadTestOptions,
+) -> LoadTestResult:
+    """Run a load test against the given Contest Web Server base urls.
+
+    Users are assigned to the targets in a round-robin fashion.
+    """
+    if not targets:
+        raise ValueError("no targets to test")
+    if not users:
+        raise ValueError("no users to log in")
+
+    result = LoadTestResult(duration=0.0, stats={})
+    contestants = [
+        Contestant(user, targets[i % len(targets)], options, result)
+        for i, user in enumerate(users)
+    ]
+
+    start = time.perf_counter()
+    logged = await asyncio.gather(*(c.login() for c in contestants))
+    result.login_duration = time.perf_counter() - start
+    active = [c for c, ok in zip(contestants, logged, strict=True) if ok]
+    if not active:
+        await asyncio.gather(*(c.close() for c in contestants))
+        raise HTTPError("no user could log in")
+
+    actions = [a for a in ACTIONS if options.weights.get(a, 0) > 0]
+    weights = [options.weights[a] for a in actions]
+    # Actions with the time they were released by the scheduler
+    queue: asyncio.Queue[tuple[str, float] | None] = asyncio.Queue()
+
+    async def contestant_loop(contestant: Contestant) -> None:
+        while (item := await queue.get()) is not None:
+            await contestant.act(*item)
+
+    async def schedule() -> None:
+        # Open-loop arrivals: actions are released at a fixed rate regardless of how
+        # fast the server answers, so a slow server shows up as higher latencies.
+        # Latencies are measured from the scheduled release, so the time an action
+        # waits for a free contestant when all of them are busy is included too.
+        total = int(options.rate * options.duration)
+        start = time.perf_counter()
+        for i in range(total):
+            released = start + i / options.rate
+            delay = released - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            queue.put_nowait((random.choices(actions, weights)[0], released))
+        for _ in active:
+            queue.put_nowait(None)
+
+    start = time.perf_counter()
+    await asyncio.gather(schedule(), *(contestant_loop(c) for c in active))
+    result.duration = time.perf_counter() - start
+
+    await asyncio.gather(*(c.close() for c in contestants))
+    return result
+
+
+def print_result(result: LoadTestResult) -> None:
+    table = PrettyTable()
+    table.field_names = [
+        "action",
+        "count",
+        "errors",
+        "ok/s",
+        "p50 (ms)",
+        "p90 (ms)",
+        "p95 (ms)",
+        "p99 (ms)",
+        "max (ms)",
+    ]
+    for action, s in result.summary().items():
+        table.add_row(
+            [
+                action,
+                int(s["count"]),
+                int(s["errors"]),
+                f"{s['throughput']:.2f}",
+                *(f"{s[k]:.1f}" for k in ("p50", "p90", "p95", "p99", "max")),
+            ],
+        )
+    print(table)
+    print(
+        f"{result.requests} requests in {result.duration:.1f}s ({result.throughput:.2f} successful/s), "
+        f"after {result.logins.count} logins in {result.login_duration:.1f}s",
+    )
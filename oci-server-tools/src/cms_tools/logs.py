@@ -0,0 +1,113 @@
+"""Tail CMS logs in several hosts and merge them into a single stream."""
+
+from __future__ import annotations
+
+import datetime
+import heapq
+import queue
+import re
+import shlex
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+_TIMESTAMP_RE = re.compile(r"^(\d{4}-\d\d-\d\d[ T]\d\d:\d\d:\d\d(?:[,.]\d+)?)")
+_SERVICE_RE = re.compile(r"^\w+$")
+
+# CMS writes the level right after the timestamp, e.g.,
+# `2025-10-19 10:00:00,123 - WARNING [EvaluationService,0] ...`
+_LEVEL_FIELD = "^[^ ]+ [^ ]+ - ({levels})[[:space:]]"
+
+
+def remote_tail_command(
+    log_dir: Path,
+    *,
+    services: list[str],
+    min_level: str | None,
+    pattern: str | None,
+    lines: int,
+    follow: bool,
+) -> str:
+    """Build a shell command tailing the logs of the given services in a host.
+
+    Lines are filtered in the remote host, so only matching lines are sent over the
+    network.
+    """
+    files: list[str] = []
+    for service in services or ["*"]:
+        if service != "*" and not _SERVICE_RE.match(service):
+            raise ValueError(f"invalid service name `{service}`")
+        # CMS keeps a `last.log` symlink pointing to the current log of each service
+        files.append(f"{shlex.quote(str(log_dir))}/{service}-*/last.log")
+
+    follow_flag = " -F" if follow else ""
+    cmd = f"tail -q -n {lines}{follow_flag} {' '.join(files)} 2>/dev/null"
+    if min_level is not None:
+        levels = "|".join(LEVELS[LEVELS.index(min_level) :])
+        level_field = _LEVEL_FIELD.format(levels=levels)
+        cmd += f" | grep --line-buffered -E {shlex.quote(level_field)}"
+    if pattern is not None:
+        cmd += f" | grep --line-buffered -E {shlex.quote(pattern)}"
+    return cmd
+
+
+def parse_timestamp(line: str) -> datetime.datetime | None:
+    if m := _TIMESTAMP_RE.match(line):
+        try:
+            return datetime.datetime.fromisoformat(m[1].replace(",", "."))
+        except ValueError:
+            return None
+    return None
+
+
+def merge(
+    streams: dict[str, IO[str]],
+    *,
+    delay: float = 1.0,
+) -> Iterator[tuple[str, str]]:
+    """Merge lines from several streams ordered by their timestamp.
+
+    Lines are buffered for `delay` seconds after they arrive so lines from slower hosts
+    can still be ordered before them. Lines without a timestamp (e.g., tracebacks) keep
+    the timestamp of the previous line in the same stream.
+    """
+    arrivals: queue.Queue[tuple[str, str] | str] = queue.Queue()
+
+    def read(name: str, stream: IO[str]) -> None:
+        try:
+            for line in stream:
+                arrivals.put((name, line.rstrip("\n")))
+        finally:
+            # Signal the stream is done, also if reading it failed
+            arrivals.put(name)
+
+    for name, stream in streams.items():
+        threading.Thread(target=read, args=(name, stream), daemon=True).start()
+
+    heap: list[tuple[datetime.datetime, int, float, str, str]] = []
+    last: dict[str, datetime.datetime] = {}
+    seq = 0
+    pending = len(streams)
+    while pending > 0 or heap:
+        try:
+            item = arrivals.get(timeout=delay / 4 if heap else None)
+        except queue.Empty:
+            item = None
+
+        if isinstance(item, str):
+            pending -= 1
+        elif item is not None:
+            name, line = item
+            ts = parse_timestamp(line) or last.get(name, datetime.datetime.min)
+            last[name] = ts
+            heapq.heappush(heap, (ts, seq, time.monotonic(), name, line))
+            seq += 1
+
+        now = time.monotonic()
+        while heap and (pending == 0 or now - heap[0][2] >= delay):
+            _, _, _, name, line = heapq.heappop(heap)
+            yield name, line
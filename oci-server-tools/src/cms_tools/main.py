@@ -2,58 +2,35 @@
 
 from __future__ import annotations
 
+# Heavy dependencies (pydantic, ruamel.yaml, tomlkit, prettytable, asyncio, PIL) are
+# imported in the commands that need them to keep the startup time low.
 from pathlib import Path
+import datetime
 import sys
-from typing import Any
-from pydantic import BaseModel
-from ruamel.yaml import YAML
-import tomlkit
-import tempfile
+import time
+from typing import IO, TYPE_CHECKING, Any
+from collections.abc import Callable
 import subprocess
 import argparse
 import re
 import os
 
+from cms_tools import deploy, hosttune, logs, sizing, snapshot
+from cms_tools.config import (
+    Config,
+    DBConf,
+    HostConfig,
+    MainHostConfig,
+    default_cache_dir,
+    load_config,
+    local_ranking_ports,
+)
 
-class Config(BaseModel):
-    secret_key: str
-    identity_file: str
-    cms_dir: str
-    main: MainHostConfig
-    workers: list[HostConfig]
-    rankings: list[str]
+if TYPE_CHECKING:
+    from cms_tools import assets, loadtest, mirror, ranking, results, supervise
 
-
-class HostConfig(BaseModel):
-    ip: str
-    workers: int
-    ssh: SSHConf
-
-
-class MainHostConfig(HostConfig):
-    db: DBConf
-    admin_web_server: AdminWebServer
-    contest_web_server: ContestWebServer
-
-
-class AdminWebServer(BaseModel):
-    listen_address: str
-
-
-class ContestWebServer(BaseModel):
-    listen_address: list[str]
-
-
-class DBConf(BaseModel):
-    name: str
-    username: str
-    password: str
-    port: int
-
-
-class SSHConf(BaseModel):
-    ip: str
-    username: str
+# Maximum CPU time (in ms) we want to spend before dispatching a command.
+STARTUP_BUDGET_MS = 150
 
 
 class Host:
@@ -90,11 +67,12 @@ class Host:
         return subprocess.check_call(cmd)
 
     def restart_resource_service(self, contest_id: str) -> None:
+        self.run(self.restart_resource_service_cmd(contest_id))
+
+    def restart_resource_service_cmd(self, contest_id: str) -> str:
         session = "resourceService"
         service = self.bin_path("cmsResourceService")
-        self.run(
-            f"screen -X -S {session} quit; screen -S {session} -d -m {service} -a {contest_id}",
-        )
+        return f"screen -X -S {session} quit; screen -S {session} -d -m {service} -a {contest_id}"
 
     def stop_resource_service(self) -> None:
         session = "resourceService"
@@ -107,6 +85,153 @@ class Host:
         self._print_cmd(cmds)
         subprocess.call(cmds)
 
+    def run_script(self, script: str) -> subprocess.CompletedProcess[str]:
+        """Run a bash script in the host through a single connection capturing its output."""
+        username = self._ssh.username
+        ip = self._ssh.ip
+        cmds = ["ssh", "-i", self._identity, f"{username}@{ip}", "bash -s"]
+        self._print_cmd(cmds)
+        return subprocess.run(
+            cmds,
+            input=script,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            check=False,
+        )
+
+    def check_output(self, cmd: str) -> str:
+        username = self._ssh.username
+        ip = self._ssh.ip
+        cmds = ["ssh", "-i", self._identity, f"{username}@{ip}", cmd]
+        self._print_cmd(cmds)
+        return subprocess.check_output(cmds, text=True)
+
+    def popen(self, cmd: str) -> subprocess.Popen[str]:
+        """Start a long running command in the host streaming its output."""
+        username = self._ssh.username
+        ip = self._ssh.ip
+        cmds = [
+            "ssh",
+            "-i",
+            self._identity,
+            # Detect dead connections instead of hanging forever
+            "-o",
+            "ServerAliveInterval=15",
+            f"{username}@{ip}",
+            cmd,
+        ]
+        self._print_cmd(cmds)
+        # Logs may have lines that aren't valid UTF-8 (e.g., from a submission)
+        return subprocess.Popen(
+            cmds,
+            stdout=subprocess.PIPE,
+            text=True,
+            errors="replace",
+        )
+
+    def stream(self, cmd: str, target: IO[bytes], stdin: bytes = b"") -> int:
+        """Run a command in the host writing its output to `target` as it arrives."""
+        username = self._ssh.username
+        ip = self._ssh.ip
+        cmds = [
+            "ssh",
+            "-i",
+            self._identity,
+            "-o",
+            "ServerAliveInterval=15",
+            f"{username}@{ip}",
+            cmd,
+        ]
+        self._print_cmd(cmds)
+        return subprocess.run(cmds, input=stdin, stdout=target, check=False).returncode
+
+    def upload(self, cmd: str, source: IO[bytes]) -> subprocess.CompletedProcess[str]:
+        """Run a command in the host feeding it `source` as it's read, capturing its output."""
+        username = self._ssh.username
+        ip = self._ssh.ip
+        cmds = [
+            "ssh",
+            "-i",
+            self._identity,
+            "-o",
+            "ServerAliveInterval=15",
+            f"{username}@{ip}",
+            cmd,
+        ]
+        self._print_cmd(cmds)
+        return subprocess.run(
+            cmds,
+            stdin=source,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            check=False,
+        )
+
+    def run_multiplexed(
+        self,
+        script: str,
+        control_dir: Path,
+        *,
+        timeout: float,
+    ) -> subprocess.CompletedProcess[str]:
+        """Run a bash script quietly through a master connection shared across calls.
+
+        The first call opens the connection and keeps it open in the background, so
+        running frequent checks doesn't pay for an ssh handshake each time. Raise
+        `subprocess.TimeoutExpired` if the script doesn't finish within `timeout`.
+        """
+        username = self._ssh.username
+        ip = self._ssh.ip
+        cmds = [
+            "ssh",
+            "-i",
+            self._identity,
+            *self._multiplexing_options(control_dir),
+            "-o",
+            "ServerAliveInterval=15",
+            # Fail instead of prompting, nobody is watching
+            "-o",
+            "BatchMode=yes",
+            f"{username}@{ip}",
+            "bash -s",
+        ]
+        return subprocess.run(
+            cmds,
+            input=script,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            check=False,
+        )
+
+    def close_multiplexed(self, control_dir: Path) -> None:
+        username = self._ssh.username
+        ip = self._ssh.ip
+        cmds = [
+            "ssh",
+            *self._multiplexing_options(control_dir),
+            "-O",
+            "exit",
+            f"{username}@{ip}",
+        ]
+        subprocess.run(cmds, capture_output=True, check=False)
+
+    def _multiplexing_options(self, control_dir: Path) -> list[str]:
+        return [
+            "-o",
+            "ControlMaster=auto",
+            # %C is a hash of the connection, short enough for the socket path limit
+            "-o",
+            f"ControlPath={control_dir}/%C",
+            "-o",
+            "ControlPersist=300",
+        ]
+
+    def probe(self) -> sizing.HostResources:
+        return sizing.HostResources.parse(self.check_output(sizing.PROBE_CMD))
+
     def connect(self) -> None:
         username = self._ssh.username
         ip = self._ssh.ip
@@ -129,13 +254,17 @@ class Main(Host):
         self._contest_web_server = conf.contest_web_server
 
     def restart_log_service(self) -> None:
+        self.run(self.restart_log_service_cmd())
+
+    def restart_log_service_cmd(self) -> str:
         session = "logService"
         service = self.bin_path("cmsLogService")
-        self.run(
-            f"screen -X -S {session} quit; screen -S {session} -d -m {service}",
-        )
+        return f"screen -X -S {session} quit; screen -S {session} -d -m {service}"
 
     def restart_ranking(self, *, yes: bool, drop: bool) -> None:
+        self.run(self.restart_ranking_cmd(yes=yes, drop=drop))
+
+    def restart_ranking_cmd(self, *, yes: bool, drop: bool) -> str:
         session = "ranking"
         cmd = [str(self.bin_path("cmsRankingWebServer"))]
         if yes:
@@ -143,34 +272,56 @@ class Main(Host):
         if drop:
             cmd.append("--drop")
         cmd_str = " ".join(cmd)
-        self.run(
-            f"screen -X -S {session} quit; screen -S {session} -d -m {cmd_str}",
-        )
+        return f"screen -X -S {session} quit; screen -S {session} -d -m {cmd_str}"
 
-    def copy_images(self) -> None:
+    @property
+    def remote_ranking_dir(self) -> Path:
+        return self.cms_dir / "lib" / "ranking"
+
+    def ranking_images(self) -> dict[str, Path]:
+        """Return the images used by the ranking indexed by their path relative to the ranking dir."""
         src = Path(__file__).parent
+        images = {"logo.png": src / "logo.png"}
+        for flag in (src / "flags").glob("*.png"):
+            images[f"flags/{flag.name}"] = flag
+        return images
+
+    def ranking_assets(self) -> assets.Bundle:
+        """Build the images copied to the ranking, reusing the ones built before."""
+        from cms_tools import assets
 
-        remote_ranking_dir = self.cms_dir / "lib" / "ranking"
-        remote_flags_dir = remote_ranking_dir / "flags"
+        cache_dir = default_cache_dir() / "ranking-assets"
+        return assets.build(self.ranking_images(), cache_dir)
 
-        # Ensure remote ranking and flags directories exist
-        self.run(f'mkdir -p "{remote_flags_dir}"')
+    def copy_images(self) -> None:
+        remote_ranking_dir = self.remote_ranking_dir
+        files = self.ranking_assets().files
 
-        # Copy logo
-        self.scp(str(src / "logo.png"), str(remote_ranking_dir / "logo.png"))
+        # Ensure remote ranking, flags and sprites directories exist
+        dirs = {(remote_ranking_dir / target).parent for target in files}
+        quoted = " ".join(f'"{d}"' for d in sorted(dirs))
+        self.run(f"mkdir -p {quoted}")
 
-        # Copy flags
-        for flag in (src / "flags").glob("*.png"):
-            self.scp(str(flag), str(remote_flags_dir / flag.name))
+        # Copy logo, flags and sprites
+        for target, image in files.items():
+            self.scp(str(image), str(remote_ranking_dir / target))
 
     @property
     def admin_web_server_listen_address(self) -> str:
         return self._admin_web_server.listen_address
 
+    @property
+    def admin_web_server_listen_port(self) -> int:
+        return self._admin_web_server.listen_port
+
     @property
     def contest_web_server_listen_address(self) -> list[str]:
         return self._contest_web_server.listen_address
 
+    @property
+    def contest_web_server_listen_port(self) -> list[int]:
+        return self._contest_web_server.ports
+
     @property
     def db(self) -> DBConf:
         return self._db
@@ -188,6 +339,15 @@ class CMSTools:
     def hosts(self) -> list[Host]:
         return [self._main, *self._workers]
 
+    def is_main(self, host: Host) -> bool:
+        return host is self._main
+
+    def host_name(self, host: Host) -> str:
+        """Return the name used to refer to `host` in the command line."""
+        if self.is_main(host):
+            return "main"
+        return f"worker{self._workers.index(host)}"
+
     def worker(self, idx: int) -> Host:
         if idx < 0 or idx > len(self._workers):
             raise Exception("Cannot find worker in configuration")
@@ -214,6 +374,80 @@ class CMSTools:
             host.restart_resource_service(self._contest_id)
             print()
 
+    def logs(
+        self,
+        pattern: str,
+        *,
+        services: list[str],
+        min_level: str | None,
+        regex: str | None,
+        lines: int,
+        follow: bool,
+    ) -> None:
+        """Print the logs of the matched hosts merged in a single stream."""
+        cmd = logs.remote_tail_command(
+            self._main.cms_dir / "log",
+            services=services,
+            min_level=min_level,
+            pattern=regex,
+            lines=lines,
+            follow=follow,
+        )
+        hosts = self.match_hosts(pattern)
+        procs = {self.host_name(host): host.popen(cmd) for host in hosts}
+        width = max(map(len, procs))
+        streams = {name: proc.stdout for name, proc in procs.items() if proc.stdout}
+        try:
+            for name, line in logs.merge(streams):
+                print(f"{name:<{width}} | {line}", flush=True)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for proc in procs.values():
+                proc.terminate()
+
+    def rolling_restart_resource_service(
+        self,
+        pattern: str,
+        *,
+        batch_size: int,
+        timeout: float,
+    ) -> None:
+        """Restart the resource service in batches of hosts.
+
+        Before moving on to the next batch, wait until the resource service and workers of
+        every host in the batch accept connections. Abort if they don't within `timeout`
+        seconds, so we never take down more hosts while some are not back.
+        """
+        from cms_tools import net
+
+        hosts = self.match_hosts(pattern)
+        batch_size = max(1, batch_size)
+        for i in range(0, len(hosts), batch_size):
+            batch = hosts[i : i + batch_size]
+            ports = [p for host in batch for p in self.resource_service_ports(host)]
+            _parallel(batch, lambda h: h.restart_resource_service(self._contest_id))
+
+            # Give the old processes a moment to release their ports so we don't mistake
+            # them for the new ones.
+            net.wait_for_ports(ports, timeout=5, is_open=False)
+            print(f"Waiting for {len(ports)} port(s) to accept connections...")
+            if pending := net.wait_for_ports(ports, timeout=timeout):
+                addresses = ", ".join(f"{ip}:{port}" for ip, port in pending)
+                raise Exception(
+                    f"Timed out waiting for {addresses}. Aborting rolling restart.",
+                )
+            print()
+
+    def resource_service_ports(self, host: Host) -> list[tuple[str, int]]:
+        """Return the addresses of the ResourceService and Workers running in `host`."""
+        services = self._services()
+        return [
+            (str(ip), int(port))
+            for ip, port in [*services["ResourceService"], *services["Worker"]]
+            if ip == host.ip
+        ]
+
     def restart_log_service(self) -> None:
         self._main.restart_log_service()
 
@@ -226,12 +460,99 @@ class CMSTools:
             print()
 
     def copy(self, pattern: str) -> None:
+        import tomlkit
+        import tempfile
+
         with tempfile.NamedTemporaryFile(mode="w+") as fp:
             tomlkit.dump(self._cms_conf(), fp)  # type: ignore
             fp.seek(0)
             for host in self.match_hosts(pattern):
                 host.scp(fp.name, str(host.cms_dir / "etc" / "cms.toml"))
 
+    def deploy_plan(
+        self,
+        pattern: str,
+        steps: list[str],
+        *,
+        yes: bool,
+        drop: bool,
+    ) -> dict[Host, list[deploy.Step]]:
+        """Plan the deploy steps required in each matched host.
+
+        Steps that only make sense in the main host (log service and ranking) are skipped
+        in the workers.
+        """
+        import tomlkit
+
+        cms_toml = tomlkit.dumps(self._cms_conf())  # type: ignore
+        plan: dict[Host, list[deploy.Step]] = {}
+        for host in self.match_hosts(pattern):
+            host_steps: list[deploy.Step] = []
+            for step in deploy.STEPS:
+                if step not in steps:
+                    continue
+                if step == "conf":
+                    path = host.cms_dir / "etc" / "cms.toml"
+                    host_steps.append(deploy.write_file(step, path, cms_toml))
+                elif step == "resource-service":
+                    cmd = host.restart_resource_service_cmd(self._contest_id)
+                    host_steps.append(deploy.Step(step, cmd))
+                elif host is not self._main:
+                    continue
+                elif step == "log-service":
+                    cmd = self._main.restart_log_service_cmd()
+                    host_steps.append(deploy.Step(step, cmd))
+                elif step == "ranking-images":
+                    host_steps.append(
+                        deploy.extract_files(
+                            step,
+                            self._main.remote_ranking_dir,
+                            self._main.ranking_assets().files,
+                        ),
+                    )
+                elif step == "ranking":
+                    cmd = self._main.restart_ranking_cmd(yes=yes, drop=drop)
+                    host_steps.append(deploy.Step(step, cmd))
+            if host_steps:
+                plan[host] = host_steps
+        return plan
+
+    def deploy(
+        self,
+        pattern: str,
+        steps: list[str],
+        *,
+        yes: bool,
+        drop: bool,
+        dry_run: bool,
+    ) -> bool:
+        """Run the deploy plan with a single connection per host.
+
+        The main host goes first because the services in every host need the log
+        service. The rest of the hosts are then deployed in parallel.
+        """
+        plan = self.deploy_plan(pattern, steps, yes=yes, drop=drop)
+        scripts = {host: deploy.render(host_steps) for host, host_steps in plan.items()}
+        if dry_run:
+            for host, script in scripts.items():
+                print(f"# {self.host_name(host)} ({host.ip})")
+                print(script)
+            return True
+
+        def run(host: Host) -> bool:
+            result = host.run_script(scripts[host])
+            name = self.host_name(host)
+            for line in result.stdout.splitlines():
+                print(f"{name} | {line}")
+            if result.returncode != 0:
+                print(f"{name} | deploy failed with exit code {result.returncode}")
+            return result.returncode == 0
+
+        if self._main in scripts and not run(self._main):
+            return False
+        others = [host for host in scripts if host is not self._main]
+        return all(_parallel(others, run))
+
     def connect(self, pattern: str) -> None:
         hosts = self.match_hosts(pattern)
         if len(hosts) == 1:
@@ -242,6 +563,184 @@ class CMSTools:
         else:
             raise Exception(f"`{pattern}` matches more than one host")
 
+    def size_workers(
+        self,
+        pattern: str,
+        policy: sizing.SizingPolicy,
+    ) -> dict[Host, int]:
+        """Probe the hardware of the matched hosts in parallel and propose a worker count for each.
+
+        Hosts that can't be probed are left out of the result.
+        """
+        hosts = self.match_hosts(pattern)
+
+        def probe(host: Host) -> sizing.HostResources | None:
+            try:
+                return host.probe()
+            except (subprocess.CalledProcessError, ValueError) as exc:
+                print(f"Cannot probe {host.ip}: {exc}")
+                return None
+
+        from prettytable import PrettyTable
+
+        table = PrettyTable()
+        table.field_names = [
+            "host",
+            "cores",
+            "physical",
+            "memory (MiB)",
+            "workers",
+            "proposed",
+        ]
+        proposed: dict[Host, int] = {}
+        for host, resources in zip(hosts, _parallel(hosts, probe), strict=True):
+            if resources is None:
+                continue
+            is_main = self.is_main(host)
+            if is_main and host.workers == 0:
+                # Don't move workers into the main host if it wasn't running any
+                count = 0
+            else:
+                count = sizing.propose_workers(resources, policy, is_main=is_main)
+            proposed[host] = count
+            table.add_row(
+                [
+                    self.host_name(host),
+                    resources.logical_cores,
+                    resources.physical_cores,
+                    resources.memory_mib,
+                    host.workers,
+                    count,
+                ],
+            )
+        print(table)
+        return proposed
+
+    def calibrate(self, pattern: str, *, threshold: float, repeat: int) -> bool:
+        """Benchmark the hosts running workers in parallel and flag the ones that deviate.
+
+        Return whether all hosts are within the threshold.
+        """
+        from cms_tools import calibrate
+
+        hosts = [h for h in self.match_hosts(pattern) if h.workers > 0]
+        if not hosts:
+            print("No hosts running workers")
+            return True
+        script = calibrate.script(repeat)
+
+        def run(host: Host) -> dict[str, float] | None:
+            result = host.run_script(script)
+            try:
+                if result.returncode != 0:
+                    raise ValueError(result.stdout.strip())
+                return calibrate.parse(result.stdout)
+            except ValueError as exc:
+                print(f"Cannot calibrate {host.ip}: {exc}")
+                return None
+
+        results: dict[str, dict[str, float]] = {}
+        for host, r in zip(hosts, _parallel(hosts, run), strict=True):
+            if r is not None:
+                results[self.host_name(host)] = r
+        if not results:
+            return False
+
+        from prettytable import PrettyTable
+
+        flagged = calibrate.deviations(results, threshold)
+        table = PrettyTable()
+        table.field_names = [
+            "host",
+            *(f"{b} (s)" for b in calibrate.BENCHMARKS),
+            "status",
+        ]
+        for name, r in results.items():
+            deviations = ", ".join(
+                f"{d.benchmark} {d.relative:+.0%}" for d in flagged[name]
+            )
+            table.add_row(
+                [
+                    name,
+                    *(f"{r[b]:.3f}" for b in calibrate.BENCHMARKS),
+                    deviations or "ok",
+                ],
+            )
+        print(table)
+        ok = len(results) == len(hosts) and not any(flagged.values())
+        if not ok:
+            print(f"Some hosts deviate more than {threshold:.0%} from the median")
+        return ok
+
+    def tune_workers(
+        self,
+        pattern: str,
+        policy: hosttune.TuningPolicy,
+        *,
+        apply: bool,
+    ) -> bool:
+        """Inspect (and with `apply` set) the timing related settings of the hosts running workers.
+
+        Return whether all hosts comply with the policy.
+        """
+        hosts = [h for h in self.match_hosts(pattern) if h.workers > 0]
+        script = hosttune.INSPECT_SCRIPT
+        if apply:
+            # Inspect again after applying to report the settings that actually changed
+            script = policy.apply_script() + script
+
+        def run(host: Host) -> list[hosttune.Check] | None:
+            result = host.run_script(script)
+            if result.returncode != 0:
+                print(f"Cannot inspect {host.ip}: {result.stdout.strip()}")
+                return None
+            for line in result.stdout.splitlines():
+                if line.startswith("cannot write"):
+                    print(f"{self.host_name(host)}: {line}")
+            return hosttune.check(hosttune.parse(result.stdout), policy)
+
+        from prettytable import PrettyTable
+
+        table = PrettyTable()
+        table.field_names = ["host", *policy.settings(), "status"]
+        compliant = True
+        for host, checks in zip(hosts, _parallel(hosts, run), strict=True):
+            if checks is None:
+                compliant = False
+                continue
+            failing = [c.setting for c in checks if not c.compliant]
+            compliant = compliant and not failing
+            table.add_row(
+                [
+                    self.host_name(host),
+                    *(
+                        c.value if c.compliant else f"{c.value} (want {c.expected})"
+                        for c in checks
+                    ),
+                    "ok" if not failing else "non-compliant",
+                ],
+            )
+        print(table)
+        if not compliant and not apply:
+            print(
+                "Run with --apply to change the settings (requires passwordless sudo)",
+            )
+        return compliant
+
+    def apply_worker_counts(self, counts: dict[Host, int], conf_path: Path) -> None:
+        """Write worker counts into the host configuration file preserving its comments."""
+        from ruamel.yaml import YAML
+
+        yaml = YAML()
+        yaml.preserve_quotes = True
+        data = yaml.load(conf_path)  # type: ignore [reportUnknownMemberType]
+        for host, count in counts.items():
+            if self.is_main(host):
+                data["main"]["workers"] = count
+            else:
+                data["workers"][self._workers.index(host)]["workers"] = count
+        yaml.dump(data, conf_path)  # type: ignore [reportUnknownMemberType]
+
     def _services(self) -> dict[str, list[list[str | int]]]:
         resource_service: list[list[str | int]] = []
         worker_service: list[list[str | int]] = []
@@ -250,6 +749,10 @@ class CMSTools:
             worker_service.extend([host.ip, 26000 + i] for i in range(host.workers))
 
         main_ip = self._main.ip
+        contest_web_server: list[list[str | int]] = [
+            [main_ip, 21000 + i]
+            for i in range(len(self._main.contest_web_server_listen_address))
+        ]
 
         return {
             "LogService": [[main_ip, 29000]],
@@ -258,7 +761,7 @@ class CMSTools:
             "Checker": [[main_ip, 22000]],
             "EvaluationService": [[main_ip, 25000]],
             "Worker": worker_service,
-            "ContestWebServer": [[main_ip, 21000]],
+            "ContestWebServer": contest_web_server,
             "AdminWebServer": [[main_ip, 21100]],
             "ProxyService": [[main_ip, 28600]],
             "PrintingService": [[main_ip, 25123]],
@@ -272,6 +775,8 @@ class CMSTools:
         return f"postgresql+psycopg2://{db.username}:{db.password}@{ip}:{db.port}/{db.name}"
 
     def _cms_conf(self) -> dict[str, Any]:
+        import tomlkit
+
         cms_conf_path = Path(__file__).parent / "cms.sample.toml"
         with cms_conf_path.open("rb") as cms_conf_file:
             cms_conf = tomlkit.load(cms_conf_file)
@@ -282,14 +787,533 @@ class CMSTools:
             cms_conf["admin_web_server"].value["listen_address"] = (
                 self._main.admin_web_server_listen_address
             )
+            cms_conf["admin_web_server"].value["listen_port"] = (
+                self._main.admin_web_server_listen_port
+            )
             cms_conf["contest_web_server"].value["listen_address"] = (
                 self._main.contest_web_server_listen_address
             )
+            cms_conf["contest_web_server"].value["listen_port"] = (
+                self._main.contest_web_server_listen_port
+            )
             return cms_conf
 
     def copy_images(self) -> None:
         self._main.copy_images()
 
+    def build_ranking_assets(self, output: Path | None) -> None:
+        import shutil
+
+        bundle = self._main.ranking_assets()
+        print(
+            f"Built {len(bundle.files)} files for the ranking: images "
+            f"{bundle.source_size / 1024:.0f} KiB -> {bundle.size / 1024:.0f} KiB, "
+            f"sprite sheet {bundle.sprites_size / 1024:.0f} KiB",
+        )
+        if output is not None:
+            for target, path in bundle.files.items():
+                (output / target).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(path, output / target)
+            print(f"Copied them to `{output}`")
+
+    def contest_web_server_urls(self) -> list[str]:
+        """Return the base url of each ContestWebServer shard."""
+        urls: list[str] = []
+        for address, port in zip(
+            self._main.contest_web_server_listen_address,
+            self._main.contest_web_server_listen_port,
+            strict=True,
+        ):
+            if address in ["", "0.0.0.0"]:
+                address = self._main.ip
+            urls.append(f"http://{address}:{port}")
+        return urls
+
+    def cluster_shape(self) -> dict[str, Any]:
+        """Describe the hosts and services a load test runs against."""
+        return {
+            "hosts": [{"ip": h.ip, "workers": h.workers} for h in self.hosts()],
+            "contest_web_servers": self.contest_web_server_urls(),
+        }
+
+    def load_test(
+        self,
+        users_file: Path,
+        options: loadtest.LoadTestOptions,
+        *,
+        urls: list[str] | None = None,
+        max_users: int | None = None,
+        store: results.ResultsStore | None = None,
+    ) -> loadtest.LoadTestResult:
+        import asyncio
+
+        from cms_tools import loadtest
+
+        users = loadtest.read_users(users_file)[:max_users]
+        targets = urls or self.contest_web_server_urls()
+        print(f"Load testing {', '.join(targets)} with {len(users)} users")
+        result = asyncio.run(loadtest.run_load_test(targets, users, options))
+        loadtest.print_result(result)
+        if store is not None:
+            shape = self.cluster_shape()
+            shape["contest_web_servers"] = targets
+            run = store.save(
+                result,
+                shape,
+                {
+                    "rate": options.rate,
+                    "duration": options.duration,
+                    "users": len(users),
+                    "tasks": options.tasks,
+                    "weights": options.weights,
+                },
+            )
+            print(f"Results saved as `{run.id}`")
+        return result
+
+    def bootstrap_ranking(
+        self,
+        *,
+        contest: ranking.Contest | None,
+        teams: list[ranking.Team],
+        users: list[ranking.User],
+        tasks: list[ranking.Task],
+        scores: list[ranking.Score],
+        urls: list[str] | None = None,
+        batch_size: int,
+        connections: int,
+    ) -> bool:
+        import asyncio
+
+        from cms_tools import ranking
+
+        targets = urls or self._rankings
+        print(
+            f"Sending {len(teams)} teams, {len(users)} users, {len(tasks)} tasks and "
+            f"{len(scores)} scores to {len(targets)} ranking(s)",
+        )
+        result = asyncio.run(
+            ranking.bootstrap(
+                targets,
+                contest=contest,
+                teams=teams,
+                users=users,
+                tasks=tasks,
+                scores=scores,
+                batch_size=batch_size,
+                connections=connections,
+            ),
+        )
+        for error in result.errors:
+            print(error)
+        print(
+            f"{result.entities} entities in {result.requests} requests "
+            f"({result.duration:.2f}s, {len(result.errors)} errors)",
+        )
+        return not result.errors
+
+    def tune_postgres(self, *, apply: bool, output: Path | None) -> None:
+        """Propose PostgreSQL settings for the main host and compare them to the live ones."""
+        from prettytable import PrettyTable
+
+        from cms_tools import pgtune
+
+        host = pgtune.DBHostResources.parse(self._main.check_output(pgtune.PROBE_CMD))
+        connections = pgtune.max_connections(self._services())
+        proposed = pgtune.propose(host, connections)
+        if output is not None:
+            output.write_text(pgtune.render(proposed))
+            print(f"postgresql.conf fragment written to `{output}`")
+
+        sql = pgtune.query_settings_sql(list(proposed))
+        current = pgtune.parse_settings(self._main.check_output(pgtune.psql_cmd(sql)))
+        diffs = pgtune.diff(current, proposed)
+
+        resources = host.resources
+        disk = "rotational" if host.rotational else "ssd"
+        print(
+            f"main: {resources.logical_cores} cores, {resources.memory_mib} MiB, {disk} disk, "
+            f"{connections} connections",
+        )
+        table = PrettyTable()
+        table.field_names = ["Setting", "Current", "Proposed", ""]
+        table.align = "l"
+        for d in diffs:
+            note = ""
+            if d.changed:
+                note = "restart" if d.needs_restart else "reload"
+            table.add_row([d.name, d.current or "-", d.proposed, note])
+        print(table)
+
+        changed = [d for d in diffs if d.changed]
+        if not changed:
+            print("PostgreSQL settings are up to date")
+            return
+        if not apply:
+            print(f"{len(changed)} settings differ, run with --apply to update them")
+            return
+        self._main.run(pgtune.psql_cmd(*pgtune.apply_statements(diffs)))
+        if any(d.needs_restart for d in changed):
+            print(
+                "Some settings only take effect after restarting PostgreSQL, "
+                "e.g., `sudo systemctl restart postgresql`",
+            )
+
+    def snapshot(self, directory: Path, compress: str) -> Path | None:
+        """Dump the database into a new snapshot in `directory`."""
+        db = self._main.db
+        now = datetime.datetime.now()
+        path = directory / snapshot.snapshot_name(db.name, now, compress)
+        partial = path.with_name(path.name + ".partial")
+        directory.mkdir(parents=True, exist_ok=True)
+        start = time.monotonic()
+        try:
+            with partial.open("wb") as f:
+                code = self._main.stream(
+                    # The same address CMS connects to (see `_database_url`)
+                    snapshot.dump_command(db, self._main.ip, compress),
+                    f,
+                    stdin=f"{db.password}\n".encode(),
+                )
+            if code != 0:
+                print(f"Snapshot failed (exit code {code})")
+                return None
+            partial.replace(path)
+        finally:
+            # Also removed if interrupted, a partial dump is never a snapshot
+            partial.unlink(missing_ok=True)
+        size = path.stat().st_size / 1024**2
+        print(f"Snapshot `{path}` ({size:.1f} MiB in {time.monotonic() - start:.1f}s)")
+        return path
+
+    def snapshots(
+        self,
+        directory: Path,
+        compress: str,
+        *,
+        every: float | None,
+        keep: int | None,
+        max_age: datetime.timedelta | None,
+    ) -> bool:
+        """Take a snapshot, or one every `every` minutes, pruning old ones after each."""
+        while True:
+            start = time.monotonic()
+            ok = self.snapshot(directory, compress) is not None
+            if ok:
+                for path in snapshot.prune(
+                    directory,
+                    self._main.db.name,
+                    keep=keep,
+                    max_age=max_age,
+                    now=datetime.datetime.now(),
+                ):
+                    print(f"Removed old snapshot `{path}`")
+            if every is None:
+                return ok
+            time.sleep(max(0.0, every * 60 - (time.monotonic() - start)))
+
+    def mirror_local_copies(self, archive: Path, *, every: float | None) -> bool:
+        """Fetch the new local copies of submissions and user tests into `archive`.
+
+        With `every`, a failed round is reported and retried in the next one.
+        """
+        from cms_tools import mirror
+
+        # cms.toml keeps the default data_dir, i.e., the lib directory of the installation
+        data_dir = self._main.cms_dir / "lib"
+        archive.mkdir(parents=True, exist_ok=True)
+        index = mirror.Index(archive)
+        while True:
+            start = time.monotonic()
+            ok = self._mirror_new_files(data_dir, archive, index)
+            if every is None:
+                return ok
+            time.sleep(max(0.0, every * 60 - (time.monotonic() - start)))
+
+    def _mirror_new_files(
+        self,
+        data_dir: Path,
+        archive: Path,
+        index: mirror.Index,
+    ) -> bool:
+        from cms_tools import mirror
+
+        try:
+            listing = self._main.check_output(mirror.list_command(data_dir))
+        except subprocess.CalledProcessError:
+            print(f"Cannot list `{data_dir}` in the main host")
+            return False
+        missing = index.missing(mirror.parse_listing(listing))
+        if not missing:
+            print(f"No new files, {len(index)} files in `{archive}`")
+            return True
+        bundle = archive / ".incoming.tar.gz"
+        with bundle.open("wb") as f:
+            code = self._main.stream(
+                mirror.fetch_command(data_dir),
+                f,
+                stdin=b"".join(p.encode() + b"\0" for p in missing),
+            )
+        if code != 0:
+            # e.g., a file vanished while copying it, the missing files are fetched again
+            bundle.unlink(missing_ok=True)
+            print(f"Fetching local copies failed (exit code {code})")
+            return False
+        count = mirror.extract(bundle, archive, index)
+        size = bundle.stat().st_size / 1024**2
+        bundle.unlink()
+        index.save()
+        print(
+            f"Fetched {count} new files ({size:.1f} MiB compressed), "
+            f"{len(index)} files in `{archive}`",
+        )
+        return True
+
+    def provision(
+        self,
+        pattern: str,
+        packages: list[str],
+        *,
+        force: bool,
+    ) -> bool:
+        """Install CMS in the matched workers copying the installation of the main host.
+
+        The archives are built once in the main host, saved locally and then streamed to
+        the hosts that need them in parallel.
+        """
+        import tempfile
+
+        from cms_tools import provision
+
+        hosts = [h for h in self.match_hosts(pattern) if not self.is_main(h)]
+        if not hosts:
+            print("No workers to provision")
+            return True
+        cms_dir = self._main.cms_dir
+        try:
+            version = self._main.check_output(provision.version_command(cms_dir))
+        except subprocess.CalledProcessError:
+            print(f"Cannot read the installation in `{cms_dir}` in the main host")
+            return False
+        version = version.strip()
+
+        stamp_cmd = provision.stamp_command(cms_dir)
+
+        def read_stamp(host: Host) -> str | None:
+            try:
+                return host.check_output(stamp_cmd).strip()
+            except subprocess.CalledProcessError:
+                return None
+
+        # Hosts that can't be reached are reported and the rest are provisioned anyway
+        stamps = dict(zip(hosts, _parallel(hosts, read_stamp), strict=True))
+        failed = [h for h, stamp in stamps.items() if stamp is None]
+        for host in failed:
+            print(f"{self.host_name(host)} | cannot be reached")
+        reachable = [h for h in hosts if stamps[h] is not None]
+        outdated = [h for h in reachable if force or stamps[h] != version]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            archives: dict[str, Path] = {}
+            if outdated:
+                for name, cmd in [
+                    ("cms", provision.archive_cms_command(cms_dir)),
+                    ("isolate", provision.archive_isolate_command()),
+                ]:
+                    archives[name] = Path(tmp, f"{name}.tar.gz")
+                    with archives[name].open("wb") as f:
+                        code = self._main.stream(cmd, f)
+                    if code != 0:
+                        print(f"Archiving {name} failed (exit code {code})")
+                        return False
+                    size = archives[name].stat().st_size / 1024**2
+                    print(f"Archived {name} in the main host ({size:.1f} MiB)")
+
+            def run(host: Host) -> bool:
+                name = self.host_name(host)
+                try:
+                    steps = self._provision_host(
+                        host,
+                        packages,
+                        archives if host in outdated else {},
+                        version,
+                    )
+                except (OSError, subprocess.SubprocessError) as exc:
+                    print(f"{name} | provision failed: {exc}")
+                    return False
+                for result in steps:
+                    for line in result.stdout.splitlines():
+                        print(f"{name} | {line}")
+                code = steps[-1].returncode
+                if code != 0:
+                    print(f"{name} | provision failed with exit code {code}")
+                else:
+                    status = "installed" if host in outdated else "already up to date"
+                    print(f"{name} | {status}")
+                return code == 0
+
+            results = _parallel(reachable, run)
+        failed += [h for h, ok in zip(reachable, results, strict=True) if not ok]
+        if failed:
+            names = ", ".join(self.host_name(h) for h in failed)
+            print(
+                f"Provisioned {len(hosts) - len(failed)} of {len(hosts)} workers, failed: {names}",
+            )
+        return not failed
+
+    def _provision_host(
+        self,
+        host: Host,
+        packages: list[str],
+        archives: dict[str, Path],
+        version: str,
+    ) -> list[subprocess.CompletedProcess[str]]:
+        """Run the steps to provision `host` until one fails, extracting `archives` if any."""
+        from cms_tools import provision
+
+        cms_dir = self._main.cms_dir
+        steps = [host.run_script(provision.packages_script(packages))]
+        if steps[-1].returncode != 0 or not archives:
+            return steps
+        for name, cmd in [
+            ("cms", provision.extract_cms_command(cms_dir)),
+            ("isolate", provision.extract_isolate_command()),
+        ]:
+            with archives[name].open("rb") as f:
+                steps.append(host.upload(cmd, f))
+            if steps[-1].returncode != 0:
+                return steps
+        steps.append(host.run_script(provision.write_stamp_command(cms_dir, version)))
+        return steps
+
+    def supervised_services(self, host: Host) -> list[supervise.Service]:
+        """Return the services running in screen sessions in `host`."""
+        from cms_tools import supervise
+
+        name = self.host_name(host)
+        services = [
+            supervise.Service(
+                host=name,
+                session="resourceService",
+                ports=tuple(port for _, port in self.resource_service_ports(host)),
+                restart_cmd=host.restart_resource_service_cmd(self._contest_id),
+            ),
+        ]
+        if self.is_main(host):
+            services.append(
+                supervise.Service(
+                    host=name,
+                    session="logService",
+                    ports=tuple(int(p) for _, p in self._services()["LogService"]),
+                    restart_cmd=self._main.restart_log_service_cmd(),
+                ),
+            )
+            services.append(
+                supervise.Service(
+                    host=name,
+                    session="ranking",
+                    ports=tuple(self._local_ranking_ports()),
+                    restart_cmd=self._main.restart_ranking_cmd(yes=False, drop=False),
+                ),
+            )
+        return services
+
+    def _local_ranking_ports(self) -> list[int]:
+        """Return the ports of the rankings running in the main host."""
+        return local_ranking_ports(self._rankings, self._main.ip)
+
+    def supervise(
+        self,
+        pattern: str,
+        *,
+        interval: float,
+        timeout: float,
+        backoff: float,
+        max_backoff: float,
+        log: Path | None,
+    ) -> None:
+        """Check the services every `interval` seconds and restart the ones that are down."""
+        import shutil
+        import tempfile
+
+        from cms_tools import supervise
+
+        hosts = self.match_hosts(pattern)
+        services = {self.host_name(h): self.supervised_services(h) for h in hosts}
+        incidents = supervise.IncidentLog(log)
+        supervisor = supervise.Supervisor(
+            [s for host_services in services.values() for s in host_services],
+            incidents,
+            backoff=backoff,
+            max_backoff=max_backoff,
+        )
+        control_dir = Path(tempfile.mkdtemp(prefix="cms-tools-"))
+
+        def check(host: Host) -> supervise.HostState | None:
+            try:
+                result = host.run_multiplexed(
+                    supervise.CHECK_SCRIPT,
+                    control_dir,
+                    timeout=timeout,
+                )
+            except subprocess.TimeoutExpired:
+                return None
+            # ssh exits with 255 if it cannot connect
+            if result.returncode == 255:
+                return None
+            return supervise.HostState.parse(result.stdout)
+
+        # Services to restart in each host, filled in every check
+        pending: dict[str, list[supervise.Service]] = {}
+
+        def restart(host: Host) -> None:
+            for service in pending[self.host_name(host)]:
+                try:
+                    result = host.run_multiplexed(
+                        service.restart_cmd,
+                        control_dir,
+                        timeout=timeout,
+                    )
+                except subprocess.TimeoutExpired:
+                    incidents.write(service.name, "restart timed out")
+                    continue
+                if result.returncode != 0:
+                    output = (result.stderr or result.stdout).strip()
+                    incidents.write(
+                        service.name,
+                        f"restart failed (exit code {result.returncode}) {output}",
+                    )
+
+        total = sum(len(s) for s in services.values())
+        print(f"Supervising {total} services in {len(hosts)} hosts every {interval}s")
+        try:
+            while True:
+                start = time.monotonic()
+                states = _parallel(hosts, check)
+                observed = {
+                    self.host_name(h): s for h, s in zip(hosts, states, strict=True)
+                }
+                pending.clear()
+                for service in supervisor.step(observed, time.monotonic()):
+                    pending.setdefault(service.host, []).append(service)
+                _parallel([h for h in hosts if self.host_name(h) in pending], restart)
+                time.sleep(max(0.0, interval - (time.monotonic() - start)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            _parallel(hosts, lambda h: h.close_multiplexed(control_dir))
+            shutil.rmtree(control_dir, ignore_errors=True)
+
+
+def _parallel[T](hosts: list[Host], f: Callable[[Host], T]) -> list[T]:
+    """Run `f` on every host concurrently and return the results in the same order."""
+    if not hosts:
+        return []
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=len(hosts)) as pool:
+        return list(pool.map(f, hosts))
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(
@@ -319,6 +1343,11 @@ def main() -> None:
         default="conf.yaml",
         help="Path to the host configuration file.",
     )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Report the time spent starting up, and whether it's over budget.",
+    )
     subparsers = parser.add_subparsers(dest="command")
 
     subparsers.add_parser(
@@ -352,6 +1381,24 @@ def main() -> None:
         session and creates a new one executing cmsResourceService -a CONTEST_ID.""",
     )
     restart_parser.add_argument("host", nargs="?", default="all")
+    restart_parser.add_argument(
+        "--rolling",
+        action="store_true",
+        help="""restart the hosts in batches, waiting until the resource service and workers of a
+        batch accept connections before restarting the next one""",
+    )
+    restart_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="number of hosts restarted at the same time in a rolling restart",
+    )
+    restart_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=120.0,
+        help="seconds to wait for a batch to be ready in a rolling restart",
+    )
 
     # stop resource service
     stop_parser = subparsers.add_parser(
@@ -380,7 +1427,22 @@ def main() -> None:
     # copy logos
     subparsers.add_parser(
         "copy-ranking-images",
-        help="copy logo and team flags for ranking web server.",
+        help="""copy logo and team flags for ranking web server. Flags are resized and
+        recompressed, and a sprite sheet with all of them is copied too.""",
+    )
+
+    # build ranking assets
+    build_ranking_assets_parser = subparsers.add_parser(
+        "build-ranking-assets",
+        help="""build the images copied to the ranking (resized and recompressed flags and a
+        sprite sheet with all of them) and report their size. Images are cached, so they are
+        only built again if they change.""",
+    )
+    build_ranking_assets_parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="directory where the built images are copied to inspect them",
     )
 
     # status
@@ -394,6 +1456,526 @@ def main() -> None:
     )
     connect_parser.add_argument("host")
 
+    # logs
+    logs_parser = subparsers.add_parser(
+        "logs",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""tail the CMS logs of the host(s) and merge them into a single stream ordered by
+        timestamp. Lines are filtered in the remote hosts.""",
+    )
+    logs_parser.add_argument("host", nargs="?", default="all")
+    logs_parser.add_argument(
+        "--service",
+        "-s",
+        action="append",
+        default=[],
+        dest="services",
+        help="only show logs of this service (e.g., Worker). Can be repeated.",
+    )
+    logs_parser.add_argument(
+        "--level",
+        "-l",
+        choices=logs.LEVELS,
+        type=str.upper,
+        default=None,
+        help="only show lines with this level or above",
+    )
+    logs_parser.add_argument(
+        "--grep",
+        "-g",
+        default=None,
+        help="only show lines matching this (extended) regular expression",
+    )
+    logs_parser.add_argument(
+        "--lines",
+        "-n",
+        type=int,
+        default=10,
+        help="number of previous lines to show from each log file",
+    )
+    logs_parser.add_argument(
+        "--no-follow",
+        action="store_false",
+        dest="follow",
+        help="print the last lines and exit instead of following the logs",
+    )
+
+    # deploy
+    deploy_parser = subparsers.add_parser(
+        "deploy",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""bring up CMS in the host(s) in one go: copy cms.toml, restart the log service,
+        copy the ranking images, restart the ranking and restart the resource services. The steps
+        of each host are bundled into a single script run over one connection. The main host is
+        deployed first and the rest of the hosts in parallel.""",
+    )
+    deploy_parser.add_argument("host", nargs="?", default="all")
+    deploy_parser.add_argument(
+        "--skip",
+        action="append",
+        choices=deploy.STEPS,
+        default=[],
+        help="skip a step. Can be repeated.",
+    )
+    deploy_parser.add_argument(
+        "--only",
+        action="append",
+        choices=deploy.STEPS,
+        default=[],
+        help="only run this step. Can be repeated.",
+    )
+    deploy_parser.add_argument(
+        "--drop",
+        action="store_true",
+        help="drop the data already stored in the ranking",
+    )
+    deploy_parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="do not require confirmation on dropping ranking data",
+    )
+    deploy_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print the script for each host instead of running it",
+    )
+
+    # size workers
+    size_parser = subparsers.add_parser(
+        "size-workers",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""probe the cores and memory of the host(s) in parallel and propose a number of
+        workers for each. Workers are limited to one per physical core and by the memory available.
+        With --apply the proposed numbers are written into the host configuration file, run
+        copy-conf afterwards to update cms.toml.""",
+    )
+    size_parser.add_argument("host", nargs="?", default="all")
+    size_parser.add_argument(
+        "--memory-per-worker",
+        type=int,
+        default=sizing.SizingPolicy.memory_per_worker_mib,
+        help="memory in MiB reserved for each worker",
+    )
+    size_parser.add_argument(
+        "--reserved-cores",
+        type=int,
+        default=sizing.SizingPolicy.reserved_cores,
+        help="physical cores left for the ResourceService and the OS in every host",
+    )
+    size_parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="write the proposed number of workers into the configuration file",
+    )
+
+    # calibrate
+    calibrate_parser = subparsers.add_parser(
+        "calibrate",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""compile and run single-thread CPU and memory benchmarks in parallel in the host(s)
+        running workers and flag the ones whose timings deviate from the median, so time limits
+        are equally strict in all of them. Exits with an error if some host deviates.""",
+    )
+    calibrate_parser.add_argument("host", nargs="?", default="all")
+    calibrate_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="relative deviation from the median considered too large",
+    )
+    calibrate_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="times each benchmark is run (the fastest run is reported)",
+    )
+
+    # tune workers
+    tune_workers_parser = subparsers.add_parser(
+        "tune-workers",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""inspect in parallel the CPU governor, turbo boost, SMT and swappiness of the
+        host(s) running workers and report whether they comply with settings that make timings
+        stable. With --apply the settings are changed (until the next reboot).""",
+    )
+    tune_workers_parser.add_argument("host", nargs="?", default="all")
+    tune_workers_parser.add_argument(
+        "--governor",
+        default=hosttune.TuningPolicy.governor,
+        help="CPU frequency governor",
+    )
+    tune_workers_parser.add_argument(
+        "--turbo",
+        choices=["on", "off"],
+        default=hosttune.TuningPolicy.turbo,
+        help="turbo boost",
+    )
+    tune_workers_parser.add_argument(
+        "--smt",
+        choices=["on", "off"],
+        default=hosttune.TuningPolicy.smt,
+        help="simultaneous multithreading (hyper-threading)",
+    )
+    tune_workers_parser.add_argument(
+        "--swappiness",
+        type=int,
+        default=int(hosttune.TuningPolicy.swappiness),
+        help="value of vm.swappiness",
+    )
+    tune_workers_parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="change the settings that don't comply",
+    )
+
+    # provision
+    provision_parser = subparsers.add_parser(
+        "provision",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""install CMS in the worker(s) in parallel: install the packages it needs and copy
+        the installation of CMS and isolate of the main host (archived once and streamed to
+        every worker). Workers that already have the same installation are skipped, so it's
+        safe to run it again after adding workers. Run deploy afterwards.""",
+    )
+    provision_parser.add_argument("host", nargs="?", default="all")
+    provision_parser.add_argument(
+        "--package",
+        dest="packages",
+        action="append",
+        default=[],
+        help="additional package to install (e.g., compilers for more languages)",
+    )
+    provision_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="copy the installation even to workers that are up to date",
+    )
+
+    # supervise
+    supervise_parser = subparsers.add_parser(
+        "supervise",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""check periodically the resourceService, logService and ranking screen sessions
+        and their ports in the host(s), restarting the services that are down with an
+        exponential backoff. Incidents are printed and appended to the log file. Runs until
+        interrupted.""",
+    )
+    supervise_parser.add_argument("host", nargs="?", default="all")
+    supervise_parser.add_argument(
+        "--interval",
+        type=float,
+        default=5,
+        help="seconds between checks",
+    )
+    supervise_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=20,
+        help="seconds after which a host that doesn't answer is considered unreachable",
+    )
+    supervise_parser.add_argument(
+        "--backoff",
+        type=float,
+        default=15,
+        help="seconds to wait before restarting a service again, doubled after each attempt",
+    )
+    supervise_parser.add_argument(
+        "--max-backoff",
+        type=float,
+        default=300,
+        help="maximum seconds to wait before restarting a service again",
+    )
+    supervise_parser.add_argument(
+        "--log",
+        type=Path,
+        default=Path("supervise.log"),
+        help="file where incidents are appended",
+    )
+
+    # load test
+    load_test_parser = subparsers.add_parser(
+        "load-test",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""
+                 log in as many users and simulate browsing, submissions and user tests
+                 against the contest web server(s), reporting latency percentiles and throughput.
+                 """,
+    )
+    load_test_parser.add_argument(
+        "users_file",
+        type=Path,
+        help="csv with users in the format used by cms-import.py: (username, password, ...)",
+        metavar="users-file",
+    )
+    load_test_parser.add_argument(
+        "--task",
+        "-t",
+        action="append",
+        required=True,
+        dest="tasks",
+        help="name of a task in the contest. Can be repeated.",
+    )
+    load_test_parser.add_argument(
+        "--rate",
+        type=float,
+        default=10.0,
+        help="total number of actions per second across all users",
+    )
+    load_test_parser.add_argument(
+        "--duration",
+        type=float,
+        default=60.0,
+        help="duration of the test in seconds",
+    )
+    load_test_parser.add_argument(
+        "--users",
+        type=int,
+        default=None,
+        help="maximum number of users to log in (default: all users in the file)",
+    )
+    load_test_parser.add_argument(
+        "--mix",
+        default="browse=0.8,submit=0.15,test=0.05",
+        help="relative weight of each action",
+    )
+    load_test_parser.add_argument(
+        "--contest",
+        default=None,
+        help="contest name used as url prefix when the server serves all contests",
+    )
+    load_test_parser.add_argument(
+        "--language",
+        default="C++17 / g++",
+        help="language used for submissions and user tests",
+    )
+    load_test_parser.add_argument(
+        "--submission",
+        type=Path,
+        default=None,
+        help="source file used for submissions and user tests",
+    )
+    load_test_parser.add_argument(
+        "--url",
+        action="append",
+        dest="urls",
+        help="""base url of a contest web server. Can be repeated. By default the urls are taken
+        from the contest web server(s) in the host configuration file.""",
+    )
+    load_test_parser.add_argument(
+        "--save",
+        action="store_true",
+        help="save the results in the results directory",
+    )
+    load_test_parser.add_argument(
+        "--results-dir",
+        type=Path,
+        default=Path("load-test-results"),
+        help="directory where load test results are stored",
+    )
+
+    # load test results
+    results_parser = subparsers.add_parser(
+        "load-test-results",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="list the stored load test results",
+    )
+    results_parser.add_argument(
+        "--results-dir",
+        type=Path,
+        default=Path("load-test-results"),
+        help="directory where load test results are stored",
+    )
+    results_parser.add_argument(
+        "--shape",
+        default=None,
+        help="only list runs made against clusters with this shape",
+    )
+
+    # compare load tests
+    compare_parser = subparsers.add_parser(
+        "compare-load-tests",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""compare the p95/p99 latencies, throughput (of successful requests) and error
+        rate of two stored load test runs and flag regressions. Runs can be specified by id, a prefix of the id or the path to its json
+        file. By default the last two runs are compared.""",
+    )
+    compare_parser.add_argument("base", nargs="?", default=None)
+    compare_parser.add_argument("new", nargs="?", default=None)
+    compare_parser.add_argument(
+        "--results-dir",
+        type=Path,
+        default=Path("load-test-results"),
+        help="directory where load test results are stored",
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative change considered a regression",
+    )
+
+    # snapshot
+    snapshot_parser = subparsers.add_parser(
+        "snapshot",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""dump the database of the main host with pg_dump, compress it in the host and
+        stream it through ssh into a local file. Nothing is written to the disk of the main host.
+        Snapshots can be taken periodically with --every and old ones pruned with --keep and
+        --max-age.""",
+    )
+    snapshot_parser.add_argument(
+        "--dir",
+        type=Path,
+        default=Path("snapshots"),
+        help="directory where snapshots are stored",
+    )
+    snapshot_parser.add_argument(
+        "--compress",
+        choices=list(snapshot.COMPRESSORS),
+        default="zstd",
+        help="compression used in the main host",
+    )
+    snapshot_parser.add_argument(
+        "--every",
+        type=float,
+        default=None,
+        help="take a snapshot every this many minutes until interrupted",
+    )
+    snapshot_parser.add_argument(
+        "--keep",
+        type=int,
+        default=None,
+        help="number of snapshots to keep (default: all)",
+    )
+    snapshot_parser.add_argument(
+        "--max-age",
+        type=float,
+        default=None,
+        help="delete snapshots older than this many hours (the newest one is always kept)",
+    )
+
+    # mirror local copies
+    mirror_parser = subparsers.add_parser(
+        "mirror-submissions",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""copy the local copies of submissions and user tests stored by the contest web
+        servers (`submit_local_copy_path` and `tests_local_copy_path`) from the main host into a
+        local archive. Only new files are transferred, in a single compressed stream. The archive
+        contains an index.csv listing the files by user and time.""",
+    )
+    mirror_parser.add_argument(
+        "--archive",
+        type=Path,
+        default=Path("local-copies"),
+        help="local directory where files are mirrored",
+    )
+    mirror_parser.add_argument(
+        "--every",
+        type=float,
+        default=None,
+        help="fetch new files every this many minutes until interrupted",
+    )
+
+    # tune postgres
+    tune_postgres_parser = subparsers.add_parser(
+        "tune-postgres",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""probe the memory, cores and disk of the main host and propose PostgreSQL settings
+        sized for the services in the cluster (max_connections grows with the number of contest
+        web servers and workers). Prints the difference with the live settings.""",
+    )
+    tune_postgres_parser.add_argument(
+        "--output",
+        "-o",
+        type=Path,
+        default=None,
+        help="also write the proposed settings as a postgresql.conf fragment to this file",
+    )
+    tune_postgres_parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="""persist the changed settings with ALTER SYSTEM (as the postgres user) and reload
+        the configuration""",
+    )
+
+    # bootstrap ranking
+    bootstrap_parser = subparsers.add_parser(
+        "bootstrap-ranking",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        help="""push the contest, teams, users, tasks and scores to the ranking(s) directly, without waiting for
+        the ProxyService to send them. Requests are sent in batches and concurrently to all rankings.
+        The csv files use the same format as cms-import.py.""",
+    )
+    bootstrap_parser.add_argument(
+        "users_file",
+        type=Path,
+        help="csv with users: (username, password, email, first name, last name, team)",
+        metavar="users-file",
+    )
+    bootstrap_parser.add_argument(
+        "--teams",
+        type=Path,
+        default=None,
+        help="csv with teams: (code, name)",
+    )
+    bootstrap_parser.add_argument(
+        "--scores",
+        type=Path,
+        default=None,
+        help="""csv with the scores of each user in each task, as written by cms-import.py
+        export-scores. The tasks are taken from its header. Requires --contest""",
+    )
+    bootstrap_parser.add_argument(
+        "--max-score",
+        type=float,
+        default=100.0,
+        help="maximum score of each task in --scores",
+    )
+    bootstrap_parser.add_argument(
+        "--contest",
+        default=None,
+        help="key of the contest to create, e.g., its name in CMS",
+    )
+    bootstrap_parser.add_argument(
+        "--contest-name",
+        default=None,
+        help="description of the contest (default: the contest key)",
+    )
+    bootstrap_parser.add_argument(
+        "--begin",
+        default=None,
+        help="start of the contest in ISO 8601 format, required with --contest",
+    )
+    bootstrap_parser.add_argument(
+        "--end",
+        default=None,
+        help="end of the contest in ISO 8601 format, required with --contest",
+    )
+    bootstrap_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="number of teams, users or scores sent in a single request",
+    )
+    bootstrap_parser.add_argument(
+        "--connections",
+        type=int,
+        default=4,
+        help="concurrent connections to each ranking",
+    )
+    bootstrap_parser.add_argument(
+        "--url",
+        action="append",
+        dest="urls",
+        help="""url of a ranking including credentials. Can be repeated. By default the rankings
+        in the host configuration file are used.""",
+    )
+    bootstrap_parser.add_argument(
+        "--with-flags",
+        action="store_true",
+        help="also copy the ranking images (logo and flags) to the main host",
+    )
+
     args = parser.parse_args()
 
     if not args.command:
@@ -401,6 +1983,8 @@ def main() -> None:
         return
 
     if args.command == "init-conf":
+        from ruamel.yaml import YAML
+
         sample_conf = Path(__file__).parent / "conf.sample.yaml"
         conf = Path("conf.yaml")
         with sample_conf.open() as sample_conf_file, conf.open("wb") as conf_file:
@@ -411,20 +1995,43 @@ def main() -> None:
             print(f"{conf} file generated in current directory")
         return
 
-    try:
-        conf = Config.model_validate(
-            YAML(typ="safe").load(Path(args.conf)),  # pyright: ignore[reportUnknownMemberType]
-            strict=True,
+    if args.command == "load-test-results":
+        from cms_tools import results
+
+        store = results.ResultsStore(args.results_dir)
+        results.print_runs(store.runs(args.shape))
+        return
+
+    if args.command == "compare-load-tests":
+        code = _compare_load_tests(
+            args.results_dir,
+            args.base,
+            args.new,
+            args.threshold,
         )
+        sys.exit(code)
+
+    try:
+        conf = load_config(Path(args.conf))
     except Exception as exc:
         print(exc)
         sys.exit(1)
 
+    if args.timings:
+        _report_startup_time()
+
     tools = CMSTools(conf, args.contest_id)
     if args.command == "stop-resource-service":
         tools.stop_resource_service(args.host)
     elif args.command == "restart-resource-service":
-        tools.restart_resource_service(args.host)
+        if args.rolling:
+            tools.rolling_restart_resource_service(
+                args.host,
+                batch_size=args.batch_size,
+                timeout=args.timeout,
+            )
+        else:
+            tools.restart_resource_service(args.host)
     elif args.command == "restart-log-service":
         tools.restart_log_service()
     elif args.command == "restart-ranking":
@@ -437,6 +2044,190 @@ def main() -> None:
         tools.connect(args.host)
     elif args.command == "copy-ranking-images":
         tools.copy_images()
+    elif args.command == "build-ranking-assets":
+        tools.build_ranking_assets(args.output)
+    elif args.command == "deploy":
+        steps = [
+            s
+            for s in deploy.STEPS
+            if (not args.only or s in args.only) and s not in args.skip
+        ]
+        ok = tools.deploy(
+            args.host,
+            steps,
+            yes=args.yes,
+            drop=args.drop,
+            dry_run=args.dry_run,
+        )
+        if not ok:
+            sys.exit(1)
+    elif args.command == "logs":
+        tools.logs(
+            args.host,
+            services=args.services,
+            min_level=args.level,
+            regex=args.grep,
+            lines=args.lines,
+            follow=args.follow,
+        )
+    elif args.command == "size-workers":
+        policy = sizing.SizingPolicy(
+            memory_per_worker_mib=args.memory_per_worker,
+            reserved_cores=args.reserved_cores,
+        )
+        proposed = tools.size_workers(args.host, policy)
+        if args.apply:
+            tools.apply_worker_counts(proposed, Path(args.conf))
+            print(f"Updated `{args.conf}`, run copy-conf to update cms.toml")
+    elif args.command == "calibrate":
+        if not tools.calibrate(args.host, threshold=args.threshold, repeat=args.repeat):
+            sys.exit(1)
+    elif args.command == "tune-workers":
+        policy = hosttune.TuningPolicy(
+            governor=args.governor,
+            turbo=args.turbo,
+            smt=args.smt,
+            swappiness=str(args.swappiness),
+        )
+        if not tools.tune_workers(args.host, policy, apply=args.apply):
+            sys.exit(1)
+    elif args.command == "provision":
+        from cms_tools import provision
+
+        packages = [*provision.PACKAGES, *args.packages]
+        if not tools.provision(args.host, packages, force=args.force):
+            sys.exit(1)
+    elif args.command == "supervise":
+        tools.supervise(
+            args.host,
+            interval=args.interval,
+            timeout=args.timeout,
+            backoff=args.backoff,
+            max_backoff=args.max_backoff,
+            log=args.log,
+        )
+    elif args.command == "load-test":
+        from cms_tools import loadtest, results
+
+        options = loadtest.LoadTestOptions(
+            tasks=args.tasks,
+            rate=args.rate,
+            duration=args.duration,
+            contest=args.contest,
+            language=args.language,
+            weights=_parse_mix(args.mix),
+        )
+        if args.submission:
+            options.submission = args.submission.read_bytes()
+        tools.load_test(
+            args.users_file,
+            options,
+            urls=args.urls,
+            max_users=args.users,
+            store=results.ResultsStore(args.results_dir) if args.save else None,
+        )
+    elif args.command == "snapshot":
+        max_age = None
+        if args.max_age is not None:
+            max_age = datetime.timedelta(hours=args.max_age)
+        ok = tools.snapshots(
+            args.dir,
+            args.compress,
+            every=args.every,
+            keep=args.keep,
+            max_age=max_age,
+        )
+        if not ok:
+            sys.exit(1)
+    elif args.command == "mirror-submissions":
+        if not tools.mirror_local_copies(args.archive, every=args.every):
+            sys.exit(1)
+    elif args.command == "tune-postgres":
+        tools.tune_postgres(apply=args.apply, output=args.output)
+    elif args.command == "bootstrap-ranking":
+        from cms_tools import ranking
+
+        contest = _parse_contest(args)
+        tasks: list[ranking.Task] = []
+        scores: list[ranking.Score] = []
+        if args.scores is not None:
+            if contest is None:
+                raise Exception("--contest is required with --scores")
+            tasks, scores = ranking.read_scores(args.scores, args.max_score)
+        ok = tools.bootstrap_ranking(
+            contest=contest,
+            teams=ranking.read_teams(args.teams) if args.teams else [],
+            users=ranking.read_users(args.users_file),
+            tasks=tasks,
+            scores=scores,
+            urls=args.urls,
+            batch_size=args.batch_size,
+            connections=args.connections,
+        )
+        if args.with_flags:
+            tools.copy_images()
+        if not ok:
+            sys.exit(1)
+
+
+def _compare_load_tests(
+    results_dir: Path,
+    base: str | None,
+    new: str | None,
+    threshold: float,
+) -> int:
+    from cms_tools import results
+
+    store = results.ResultsStore(results_dir)
+    if base is None or new is None:
+        runs = store.runs()
+        if len(runs) < 2:
+            print(f"At least two runs are needed in `{results_dir}` to compare")
+            return 1
+        base_run = store.get(base) if base else runs[-2]
+        new_run = runs[-1]
+    else:
+        base_run = store.get(base)
+        new_run = store.get(new)
+    comparisons = results.compare(base_run, new_run, threshold)
+    results.print_comparison(base_run, new_run, comparisons)
+    return 1 if any(c.regression for c in comparisons) else 0
+
+
+def _report_startup_time() -> None:
+    # CPU time used so far by the process, which includes the interpreter startup,
+    # imports and loading the configuration.
+    elapsed = time.process_time() * 1000
+    print(f"startup: {elapsed:.0f}ms (budget {STARTUP_BUDGET_MS}ms)", file=sys.stderr)
+    if elapsed > STARTUP_BUDGET_MS:
+        print("warning: startup time is over budget", file=sys.stderr)
+
+
+def _parse_mix(mix: str) -> dict[str, float]:
+    from cms_tools import loadtest
+
+    weights: dict[str, float] = {}
+    for item in mix.split(","):
+        action, _, weight = item.partition("=")
+        if action.strip() not in loadtest.ACTIONS:
+            raise Exception(f"Unknown action `{action}` in mix")
+        weights[action.strip()] = float(weight)
+    return weights
+
+
+def _parse_contest(args: argparse.Namespace) -> ranking.Contest | None:
+    from cms_tools import ranking
+
+    if args.contest is None:
+        return None
+    if args.begin is None or args.end is None:
+        raise Exception("--begin and --end are required with --contest")
+    return ranking.Contest(
+        key=args.contest,
+        name=args.contest_name or args.contest,
+        begin=int(datetime.datetime.fromisoformat(args.begin).timestamp()),
+        end=int(datetime.datetime.fromisoformat(args.end).timestamp()),
+    )
 
 
 if __name__ == "__main__":
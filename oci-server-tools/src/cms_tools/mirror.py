@@ -0,0 +1,126 @@
+"""Mirror the local copies of submissions and user tests kept in the main host.
+
+ContestWebServer stores a copy of every submission and user test in
+`<data_dir>/submissions/<username>/<timestamp>` (and the same for `tests`). Each run
+lists the files in the host, compares them with a local index and fetches only the new
+ones as a single compressed tar stream.
+"""
+
+from __future__ import annotations
+
+import csv
+import datetime
+import shlex
+import tarfile
+from dataclasses import dataclass
+from pathlib import Path
+
+KINDS = ["submissions", "tests"]
+
+INDEX_FILE = "index.csv"
+
+
+@dataclass(frozen=True)
+class Entry:
+    kind: str
+    user: str
+    time: str
+    path: str
+    size: int
+
+    @staticmethod
+    def from_path(path: str, size: int) -> Entry:
+        kind, _, rest = path.partition("/")
+        user, _, name = rest.rpartition("/")
+        try:
+            stamp = datetime.datetime.fromtimestamp(float(name), datetime.UTC)
+            time = stamp.isoformat(timespec="seconds")
+        except ValueError:
+            time = ""
+        return Entry(kind=kind, user=user, time=time, path=path, size=size)
+
+
+def list_command(data_dir: Path) -> str:
+    """Build a remote command listing the files to mirror with their size."""
+    dirs = " ".join(shlex.quote(k) for k in KINDS)
+    return (
+        f"cd {shlex.quote(str(data_dir))} || exit 1; "
+        f"find {dirs} -type f -printf '%p\\t%s\\n' 2>/dev/null; exit 0"
+    )
+
+
+def fetch_command(data_dir: Path) -> str:
+    """Build a remote command writing a tar.gz with the files listed in stdin."""
+    return f"cd {shlex.quote(str(data_dir))} && tar -czf - --null -T -"
+
+
+def parse_listing(output: str) -> dict[str, int]:
+    files: dict[str, int] = {}
+    for line in output.splitlines():
+        path, _, size = line.rpartition("\t")
+        if path:
+            files[path] = int(size)
+    return files
+
+
+class Index:
+    """Files already in the local archive, stored as a csv sorted by user and time."""
+
+    def __init__(self, archive: Path) -> None:
+        self._path = archive / INDEX_FILE
+        self._entries: dict[str, Entry] = {}
+        if self._path.exists():
+            with self._path.open(newline="") as f:
+                for row in csv.DictReader(f):
+                    entry = Entry(
+                        kind=row["kind"],
+                        user=row["user"],
+                        time=row["time"],
+                        path=row["path"],
+                        size=int(row["size"]),
+                    )
+                    self._entries[entry.path] = entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def missing(self, files: dict[str, int]) -> list[str]:
+        """Return the files that are new or changed size since they were fetched.
+
+        A file may be listed while ContestWebServer is still writing it, comparing the
+        size makes sure it's fetched again once it's complete.
+        """
+        return sorted(
+            path
+            for path, size in files.items()
+            if path not in self._entries or self._entries[path].size != size
+        )
+
+    def add(self, entry: Entry) -> None:
+        self._entries[entry.path] = entry
+
+    def save(self) -> None:
+        entries = sorted(
+            self._entries.values(),
+            key=lambda e: (e.kind, e.user, e.time, e.path),
+        )
+        tmp = self._path.with_suffix(".tmp")
+        with tmp.open("w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "user", "time", "path", "size"])
+            for e in entries:
+                writer.writerow([e.kind, e.user, e.time, e.path, e.size])
+        tmp.replace(self._path)
+
+
+def extract(bundle: Path, archive: Path, index: Index) -> int:
+    """Extract a fetched bundle into the archive adding its files to the index."""
+    count = 0
+    with tarfile.open(bundle, "r:gz") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            tar.extract(member, archive, filter="data")
+            index.add(Entry.from_path(member.name, member.size))
+            count += 1
+    return count
@@ -0,0 +1,34 @@
+"""Helpers to check whether services are accepting connections."""
+
+from __future__ import annotations
+
+import socket
+import time
+
+
+def port_open(ip: str, port: int, timeout: float = 1.0) -> bool:
+    try:
+        with socket.create_connection((ip, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_for_ports(
+    addresses: list[tuple[str, int]],
+    *,
+    timeout: float,
+    is_open: bool = True,
+    interval: float = 1.0,
+) -> list[tuple[str, int]]:
+    """Wait until all `addresses` are accepting (or refusing) connections.
+
+    Return the addresses that didn't reach the expected state before the timeout.
+    """
+    deadline = time.monotonic() + timeout
+    pending = list(addresses)
+    while True:
+        pending = [(ip, port) for ip, port in pending if port_open(ip, port) != is_open]
+        if not pending or time.monotonic() >= deadline:
+            return pending
+        time.sleep(interval)
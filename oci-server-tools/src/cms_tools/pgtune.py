@@ -0,0 +1,191 @@
+"""Tune PostgreSQL in the main host for the CMS services that connect to it.
+
+Settings are derived from the memory, cores and disk of the main host and from the
+number of CMS services in the cluster, which determines how many connections the
+database has to accept.
+"""
+
+from __future__ import annotations
+
+import re
+import shlex
+from dataclasses import dataclass
+
+from cms_tools import sizing
+
+# Prints the same as `sizing.PROBE_CMD` followed by 1 if the disk holding the
+# PostgreSQL data directory is rotational and 0 otherwise.
+PROBE_CMD = (
+    f"{sizing.PROBE_CMD}; "
+    'lsblk -ndo ROTA "$(findmnt -no SOURCE --target /var/lib/postgresql)" 2>/dev/null '
+    "| head -n 1 | grep . || echo 1"
+)
+
+# Connections each process keeps in its pool in the worst case. CMS uses the
+# SQLAlchemy defaults (a pool of 5 plus 10 overflow connections), but only the web
+# servers open more than a handful of them concurrently.
+CONNECTIONS_PER_WEB_SERVER = 15
+CONNECTIONS_PER_SERVICE = 5
+# Connections left for psql, cms-import.py, pg_dump, etc.
+RESERVED_CONNECTIONS = 20
+
+_WEB_SERVERS = {"ContestWebServer", "AdminWebServer"}
+
+_MEMORY_RE = re.compile(r"^(\d+)(B|kB|MB|GB|TB)$")
+_MEMORY_UNITS = {"B": 1, "kB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+
+
+@dataclass(frozen=True)
+class DBHostResources:
+    resources: sizing.HostResources
+    rotational: bool
+
+    @staticmethod
+    def parse(output: str) -> DBHostResources:
+        lines = output.split()
+        if len(lines) != 4:
+            raise ValueError(f"unexpected output probing host: {output!r}")
+        return DBHostResources(
+            resources=sizing.HostResources.parse("\n".join(lines[:3])),
+            rotational=lines[3] != "0",
+        )
+
+
+@dataclass(frozen=True)
+class SettingDiff:
+    name: str
+    current: str | None
+    proposed: str
+    # Whether PostgreSQL must be restarted (not just reloaded) for the change to apply
+    needs_restart: bool
+
+    @property
+    def changed(self) -> bool:
+        if self.current is None:
+            return True
+        return normalize(self.current) != normalize(self.proposed)
+
+
+def max_connections(services: dict[str, list[list[str | int]]]) -> int:
+    """Estimate the connections needed by the CMS services in the cluster."""
+    total = RESERVED_CONNECTIONS
+    for name, instances in services.items():
+        if name in _WEB_SERVERS:
+            total += CONNECTIONS_PER_WEB_SERVER * len(instances)
+        else:
+            total += CONNECTIONS_PER_SERVICE * len(instances)
+    return total
+
+
+def propose(host: DBHostResources, connections: int) -> dict[str, str]:
+    """Propose PostgreSQL settings for a host dedicated to CMS."""
+    memory_mib = host.resources.memory_mib
+    cores = host.resources.logical_cores
+    shared_buffers = memory_mib // 4
+    # Each query may use several times work_mem (one per sort or hash node), so leave
+    # some margin for the connections that run concurrently.
+    work_mem = max(4, (memory_mib - shared_buffers) // (connections * 3))
+    return {
+        "max_connections": str(connections),
+        "shared_buffers": f"{shared_buffers}MB",
+        "effective_cache_size": f"{memory_mib * 3 // 4}MB",
+        "work_mem": f"{work_mem}MB",
+        "maintenance_work_mem": f"{min(2048, max(64, memory_mib // 16))}MB",
+        "wal_buffers": "16MB",
+        "min_wal_size": "1GB",
+        "max_wal_size": "4GB",
+        "checkpoint_completion_target": "0.9",
+        "wal_compression": "on",
+        "random_page_cost": "4" if host.rotational else "1.1",
+        "effective_io_concurrency": "2" if host.rotational else "200",
+        # Background workers are also used by extensions, keep at least the default
+        "max_worker_processes": str(max(8, cores)),
+        "max_parallel_workers": str(cores),
+        "max_parallel_workers_per_gather": str(max(1, min(4, cores // 2))),
+    }
+
+
+def render(settings: dict[str, str]) -> str:
+    """Render settings as a postgresql.conf fragment."""
+    lines = ["# Generated by cms-tools tune-postgres"]
+    lines.extend(f"{name} = '{value}'" for name, value in settings.items())
+    return "\n".join(lines) + "\n"
+
+
+def query_settings_sql(names: list[str]) -> str:
+    quoted = ", ".join(f"'{name}'" for name in names)
+    return (
+        "SELECT name, setting, coalesce(unit, ''), context FROM pg_settings "
+        f"WHERE name IN ({quoted})"
+    )
+
+
+def parse_settings(output: str) -> dict[str, tuple[str, bool]]:
+    """Parse the output of `query_settings_sql` run with `psql -At -F '|'`.
+
+    Returns the current value of each setting and whether changing it needs a restart.
+    """
+    settings: dict[str, tuple[str, bool]] = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        name, setting, unit, context = line.split("|")
+        settings[name] = (_with_unit(setting, unit), context == "postmaster")
+    return settings
+
+
+def diff(
+    current: dict[str, tuple[str, bool]],
+    proposed: dict[str, str],
+) -> list[SettingDiff]:
+    diffs: list[SettingDiff] = []
+    for name, value in proposed.items():
+        live, needs_restart = current.get(name, (None, False))
+        diffs.append(SettingDiff(name, live, value, needs_restart))
+    return diffs
+
+
+def apply_statements(diffs: list[SettingDiff]) -> list[str]:
+    """Build the SQL persisting the changed settings and reloading the configuration."""
+    statements = [
+        f"ALTER SYSTEM SET {d.name} = '{d.proposed}'" for d in diffs if d.changed
+    ]
+    statements.append("SELECT pg_reload_conf()")
+    return statements
+
+
+def psql_cmd(*statements: str) -> str:
+    """Build a shell command running `statements` as the postgres superuser.
+
+    Each statement is passed in its own `-c` so it runs in its own transaction, which
+    `ALTER SYSTEM` requires.
+    """
+    commands = " ".join(f"-c {shlex.quote(s)}" for s in statements)
+    return f"sudo -u postgres psql -X -At -F '|' {commands}"
+
+
+def normalize(value: str) -> str:
+    """Normalize a setting so equivalent values compare equal (e.g., 1GB and 1024MB)."""
+    if m := _MEMORY_RE.match(value):
+        return str(int(m[1]) * _MEMORY_UNITS[m[2]])
+    try:
+        return str(float(value))
+    except ValueError:
+        return value.lower()
+
+
+def _with_unit(setting: str, unit: str) -> str:
+    # -1 means the value is derived from other settings (e.g., wal_buffers)
+    if setting.startswith("-"):
+        return setting
+    # Memory settings are reported in multiples of a unit, e.g., 16384 with unit 8kB
+    if m := re.match(r"^(\d*)(B|kB|MB|GB|TB)$", unit):
+        scale = int(m[1] or 1) * _MEMORY_UNITS[m[2]]
+        size = int(setting) * scale
+        for suffix in ["TB", "GB", "MB", "kB"]:
+            if size % _MEMORY_UNITS[suffix] == 0:
+                return f"{size // _MEMORY_UNITS[suffix]}{suffix}"
+        return f"{size}B"
+    if unit:
+        return f"{setting}{unit}"
+    return setting
@@ -0,0 +1,112 @@
+"""Install CMS in new worker hosts by copying the installation of the main host.
+
+The installation of CMS (the virtual env in `cms_dir`) and isolate are archived once in
+the main host and streamed to every host that needs them, so hosts don't build anything.
+Every step is idempotent: missing packages are installed, and the archives are only
+extracted in hosts whose installation differs from the one in the main host, which is
+tracked with a stamp file.
+"""
+
+from __future__ import annotations
+
+import shlex
+from pathlib import Path
+
+# Packages needed to run CMS and evaluate submissions in a worker
+PACKAGES = [
+    "build-essential",
+    "python3",
+    "screen",
+    "libcap2",
+    "libpq5",
+    "libyaml-0-2",
+]
+
+# Files installed by isolate (its setuid binary and its configuration)
+ISOLATE_PATHS = [Path("/usr/local/bin/isolate"), Path("/usr/local/etc/isolate")]
+
+# Group allowed to run isolate, as created by the installation of CMS
+ISOLATE_GROUP = "cmsuser"
+
+# Directories of the installation with data of the host (logs, local copies, ranking,
+# ...) and the configuration, which is copied with copy-conf.
+EXCLUDE = ["log", "cache", "run", "lib/ranking", "lib/submissions", "lib/tests", "etc"]
+
+STAMP_FILE = ".provisioned"
+
+
+def version_command(cms_dir: Path) -> str:
+    """Build a command printing an identifier of the installation in a host.
+
+    It hashes the name, size and modification time of the installed files and links
+    (not their content, which would take much longer) and the content of isolate's
+    files. Directories are left out since their time changes as files are added.
+    """
+    prune = " -o ".join(f"-path ./{shlex.quote(e)}" for e in EXCLUDE)
+    isolate = " ".join(shlex.quote(str(p)) for p in ISOLATE_PATHS)
+    return (
+        f"{{ cd {shlex.quote(str(cms_dir))} && "
+        f"find . \\( {prune} -o -name {STAMP_FILE} \\) -prune -o ! -type d -printf '%P %s %T@\\n' "
+        f"| sort && sha256sum {isolate}; }} | sha256sum | cut -d' ' -f1"
+    )
+
+
+def stamp_command(cms_dir: Path) -> str:
+    """Build a command printing the version of the installation copied into a host."""
+    return f"cat {shlex.quote(str(cms_dir / STAMP_FILE))} 2>/dev/null; exit 0"
+
+
+def archive_cms_command(cms_dir: Path) -> str:
+    excludes = " ".join(f"--exclude=./{shlex.quote(e)}" for e in EXCLUDE)
+    return f"tar -C {shlex.quote(str(cms_dir))} {excludes} --exclude=./{STAMP_FILE} -czf - ."
+
+
+def archive_isolate_command() -> str:
+    paths = " ".join(shlex.quote(str(p.relative_to("/"))) for p in ISOLATE_PATHS)
+    return f"tar -C / -czf - {paths}"
+
+
+def packages_script(packages: list[str]) -> str:
+    """Build a script installing the packages that are missing (requires passwordless sudo)."""
+    quoted = " ".join(shlex.quote(p) for p in packages)
+    return (
+        "set -e\n"
+        "missing=$(for p in " + quoted + "; do "
+        "dpkg-query -W -f='${Status}' \"$p\" 2>/dev/null | grep -q 'ok installed' "
+        '|| echo "$p"; done)\n'
+        'if [ -z "$missing" ]; then echo "packages already installed"; exit 0; fi\n'
+        'echo "installing" $missing\n'
+        "export DEBIAN_FRONTEND=noninteractive\n"
+        "sudo -n apt-get update -q\n"
+        "sudo -n apt-get install -y -q $missing\n"
+    )
+
+
+def extract_cms_command(cms_dir: Path) -> str:
+    """Build a command extracting the archive of the installation read from stdin."""
+    target = shlex.quote(str(cms_dir))
+    stamp = shlex.quote(str(cms_dir / STAMP_FILE))
+    dirs = " ".join(shlex.quote(str(cms_dir / e)) for e in EXCLUDE)
+    return f"set -e; rm -f {stamp}; mkdir -p {target}; tar -C {target} -xzf -; mkdir -p {dirs}"
+
+
+def write_stamp_command(cms_dir: Path, version: str) -> str:
+    # Written once everything is installed, so an interrupted install is done again
+    stamp = shlex.quote(str(cms_dir / STAMP_FILE))
+    return f"echo {shlex.quote(version)} > {stamp}"
+
+
+def extract_isolate_command() -> str:
+    """Build a command extracting isolate from stdin (requires passwordless sudo).
+
+    isolate must be setuid root and only runnable by the users in ISOLATE_GROUP, which
+    includes the user running CMS.
+    """
+    binary = shlex.quote(str(ISOLATE_PATHS[0]))
+    return (
+        "set -e; sudo -n tar -C / -xzf - --no-same-owner; "
+        f"sudo -n groupadd -f {ISOLATE_GROUP}; "
+        f'sudo -n usermod -a -G {ISOLATE_GROUP} "$(id -un)"; '
+        f"sudo -n chown root:{ISOLATE_GROUP} {binary}; "
+        f"sudo -n chmod 4750 {binary}"
+    )
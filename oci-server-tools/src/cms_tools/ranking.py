@@ -0,0 +1,257 @@
+"""Populate Ranking Web Servers through their HTTP API.
+
+ProxyService only sends the contest data to the rankings as it notices it, so a
+freshly dropped ranking stays empty for a while. This module reads the same csv files
+used by `cms-import.py` and pushes the contest, teams, users, tasks and scores to every
+ranking with concurrent batched PUTs over a pool of keep-alive connections.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import json
+import time
+from collections.abc import Coroutine
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from cms_tools.httpclient import ClientPool, HTTPError
+
+
+@dataclass(frozen=True)
+class Contest:
+    key: str
+    name: str
+    begin: int
+    end: int
+    score_precision: int = 0
+
+
+@dataclass(frozen=True)
+class Team:
+    code: str
+    name: str
+
+
+@dataclass(frozen=True)
+class User:
+    username: str
+    first_name: str
+    last_name: str
+    team: str | None
+
+
+@dataclass(frozen=True)
+class Task:
+    key: str
+    name: str
+    order: int
+    max_score: float
+
+
+@dataclass(frozen=True)
+class Score:
+    username: str
+    task: str
+    score: float
+
+
+@dataclass
+class BootstrapResult:
+    duration: float = 0.0
+    requests: int = 0
+    entities: int = 0
+    errors: list[str] = field(default_factory=list[str])
+
+
+def read_teams(path: Path) -> list[Team]:
+    """Read teams from a csv in the format expected by `cms-import.py import-teams`."""
+    with path.open(newline="") as csvfile:
+        return [
+            Team(code=row[0], name=row[1])
+            for row in csv.reader(csvfile)
+            if len(row) >= 2
+        ]
+
+
+def read_users(path: Path) -> list[User]:
+    """Read users from a csv in the format expected by `cms-import.py import-participations`."""
+    with path.open(newline="") as csvfile:
+        return [
+            User(
+                username=row[0],
+                first_name=row[3],
+                last_name=row[4],
+                team=row[5] or None if len(row) > 5 else None,
+            )
+            for row in csv.reader(csvfile)
+            if len(row) >= 5
+        ]
+
+
+def read_scores(path: Path, max_score: float) -> tuple[list[Task], list[Score]]:
+    """Read the tasks and scores in a csv written by `cms-import.py export-scores`.
+
+    The header has the username, the name of each task and the total. Zero scores are
+    skipped, the ranking shows them anyway.
+    """
+    with path.open(newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, list[str]())
+        names = header[1:-1]
+        tasks = [
+            Task(key=name, name=name, order=i, max_score=max_score)
+            for i, name in enumerate(names)
+        ]
+        scores = [
+            Score(username=row[0], task=name, score=float(value))
+            for row in reader
+            if row
+            for name, value in zip(names, row[1:], strict=False)
+            if float(value) > 0
+        ]
+    return tasks, scores
+
+
+def _batches[T](items: list[T], size: int) -> list[list[T]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+async def bootstrap(
+    urls: list[str],
+    *,
+    contest: Contest | None,
+    teams: list[Team],
+    users: list[User],
+    tasks: list[Task] | None = None,
+    scores: list[Score] | None = None,
+    batch_size: int = 500,
+    connections: int = 4,
+    timeout: float = 30.0,
+) -> BootstrapResult:
+    """Push the contest, teams, users, tasks and scores to all rankings concurrently.
+
+    The ranking rejects entities referencing others that don't exist, so they are pushed
+    in order: the contest and teams, then tasks and users, and then the scores. Each
+    score is sent as a submission of the user to the task, made at the time of the
+    bootstrap (within the contest), and a change setting its score.
+    """
+    result = BootstrapResult()
+    start = time.perf_counter()
+    tasks = tasks or []
+    scores = scores or []
+    if (tasks or scores) and contest is None:
+        raise ValueError("tasks and scores need a contest")
+    now = int(time.time())
+    if contest is not None:
+        now = min(max(now, contest.begin), contest.end)
+    # Keys that can't clash with the ones of the submissions sent by ProxyService,
+    # which are numeric ids
+    submissions = {f"bootstrap_{i}": s for i, s in enumerate(scores)}
+
+    async def put(pool: ClientPool, url: str, path: str, data: dict[str, Any]) -> None:
+        body = json.dumps(data).encode()
+        result.requests += 1
+        try:
+            async with pool.client() as client:
+                response = await client.request("PUT", path, body, "application/json")
+        except HTTPError as exc:
+            result.errors.append(f"{url}: {exc}")
+            return
+        if response.status >= 400:
+            result.errors.append(f"{url}: PUT {path} returned {response.status}")
+        else:
+            result.entities += len(data) if path.endswith("/") else 1
+
+    async def populate(url: str) -> None:
+        pool = ClientPool(url.rstrip("/"), connections, timeout)
+        try:
+            first: list[Coroutine[Any, Any, None]] = []
+            if contest is not None:
+                data = {
+                    "name": contest.name,
+                    "begin": contest.begin,
+                    "end": contest.end,
+                    "score_precision": contest.score_precision,
+                }
+                first.append(put(pool, url, f"/contests/{contest.key}", data))
+            for batch in _batches(teams, batch_size):
+                data = {t.code: {"name": t.name} for t in batch}
+                first.append(put(pool, url, "/teams/", data))
+            await asyncio.gather(*first)
+
+            second: list[Coroutine[Any, Any, None]] = []
+            if contest is not None and tasks:
+                data = {
+                    t.key: {
+                        "name": t.name,
+                        "short_name": t.name,
+                        "contest": contest.key,
+                        "order": t.order,
+                        "max_score": t.max_score,
+                        "extra_headers": list[str](),
+                        "score_precision": contest.score_precision,
+                        "score_mode": "max",
+                    }
+                    for t in tasks
+                }
+                second.append(put(pool, url, "/tasks/", data))
+            for batch in _batches(users, batch_size):
+                data = {
+                    u.username: {
+                        "f_name": u.first_name,
+                        "l_name": u.last_name,
+                        "team": u.team,
+                    }
+                    for u in batch
+                }
+                second.append(put(pool, url, "/users/", data))
+            await asyncio.gather(*second)
+
+            keys = list(submissions)
+            await asyncio.gather(
+                *(
+                    put(
+                        pool,
+                        url,
+                        "/submissions/",
+                        {
+                            key: {
+                                "user": submissions[key].username,
+                                "task": submissions[key].task,
+                                "time": now,
+                            }
+                            for key in batch
+                        },
+                    )
+                    for batch in _batches(keys, batch_size)
+                ),
+            )
+            # Keyed like the ones sent by ProxyService
+            await asyncio.gather(
+                *(
+                    put(
+                        pool,
+                        url,
+                        "/subchanges/",
+                        {
+                            f"{now}{key}s": {
+                                "submission": key,
+                                "time": now,
+                                "score": submissions[key].score,
+                                "extra": list[str](),
+                            }
+                            for key in batch
+                        },
+                    )
+                    for batch in _batches(keys, batch_size)
+                ),
+            )
+        finally:
+            await pool.close()
+
+    await asyncio.gather(*(populate(url) for url in urls))
+    result.duration = time.perf_counter() - start
+    return result
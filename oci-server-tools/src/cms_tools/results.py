@@ -0,0 +1,240 @@
+"""Storage and comparison of load test results.
+
+Each run is stored as a JSON file in a results directory and summarized as a row in
+`results.csv` within the same directory. Runs are keyed by the shape of the cluster
+they were run against so runs with different number of workers or contest web servers
+can be told apart.
+"""
+
+from __future__ import annotations
+
+import csv
+import datetime
+import hashlib
+import json
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from prettytable import PrettyTable
+
+from cms_tools.loadtest import LoadTestResult
+
+INDEX = "results.csv"
+
+INDEX_FIELDS = [
+    "id",
+    "created",
+    "shape",
+    "hosts",
+    "workers",
+    "contest_web_servers",
+    "rate",
+    "users",
+    "requests",
+    "errors",
+    "throughput",
+    "p50",
+    "p95",
+    "p99",
+]
+
+# Metrics compared between runs and whether higher values are better
+METRICS = {"p95": False, "p99": False, "throughput": True, "error_rate": False}
+
+# Parameters of the load test that must match for the runs to be comparable
+PARAMS = ("rate", "users")
+
+
+def shape_key(shape: dict[str, Any]) -> str:
+    """Return a short human readable key identifying a cluster shape."""
+    hosts = shape["hosts"]
+    workers = sum(h["workers"] for h in hosts)
+    cws = len(shape["contest_web_servers"])
+    digest = hashlib.sha256(json.dumps(shape, sort_keys=True).encode()).hexdigest()
+    return f"h{len(hosts)}-w{workers}-cws{cws}-{digest[:8]}"
+
+
+@dataclass
+class Run:
+    id: str
+    data: dict[str, Any]
+
+    @property
+    def shape(self) -> str:
+        return self.data["shape_key"]
+
+    @property
+    def total(self) -> dict[str, float]:
+        return self.data["summary"]["total"]
+
+
+class ResultsStore:
+    def __init__(self, path: Path) -> None:
+        self._path = path
+
+    def save(
+        self,
+        result: LoadTestResult,
+        shape: dict[str, Any],
+        params: dict[str, Any],
+    ) -> Run:
+        self._path.mkdir(parents=True, exist_ok=True)
+        created = datetime.datetime.now(tz=datetime.UTC)
+        key = shape_key(shape)
+        run_id = f"{created:%Y%m%dT%H%M%S}-{key}"
+        data: dict[str, Any] = {
+            "id": run_id,
+            "created": created.isoformat(timespec="seconds"),
+            "shape_key": key,
+            "shape": shape,
+            "params": params,
+            "duration": result.duration,
+            "summary": result.summary(),
+        }
+        with (self._path / f"{run_id}.json").open("w") as f:
+            json.dump(data, f, indent=2)
+
+        index = self._path / INDEX
+        new = not index.exists()
+        with index.open("a", newline="") as f:
+            writer = csv.DictWriter(f, INDEX_FIELDS)
+            if new:
+                writer.writeheader()
+            total = data["summary"]["total"]
+            writer.writerow(
+                {
+                    "id": run_id,
+                    "created": data["created"],
+                    "shape": key,
+                    "hosts": len(shape["hosts"]),
+                    "workers": sum(h["workers"] for h in shape["hosts"]),
+                    "contest_web_servers": len(shape["contest_web_servers"]),
+                    "rate": params.get("rate", ""),
+                    "users": params.get("users", ""),
+                    "requests": int(total["count"]),
+                    "errors": int(total["errors"]),
+                    "throughput": f"{total['throughput']:.3f}",
+                    "p50": f"{total['p50']:.3f}",
+                    "p95": f"{total['p95']:.3f}",
+                    "p99": f"{total['p99']:.3f}",
+                },
+            )
+        return Run(run_id, data)
+
+    def runs(self, shape: str | None = None) -> list[Run]:
+        """Return all stored runs (optionally filtered by shape) sorted by creation time."""
+        runs: list[Run] = []
+        for path in sorted(self._path.glob("*.json")):
+            with path.open() as f:
+                data = json.load(f)
+            if shape is None or data["shape_key"] == shape:
+                runs.append(Run(data["id"], data))
+        runs.sort(key=lambda r: r.data["created"])
+        return runs
+
+    def get(self, run: str) -> Run:
+        """Get a run by id, by a prefix of its id, or by the path to its json file."""
+        path = Path(run)
+        if path.suffix == ".json" and path.exists():
+            with path.open() as f:
+                data = json.load(f)
+            return Run(data["id"], data)
+        matches = [r for r in self.runs() if r.id.startswith(run)]
+        if len(matches) != 1:
+            raise Exception(
+                f"`{run}` matches {len(matches)} runs in `{self._path}`",
+            )
+        return matches[0]
+
+
+@dataclass
+class Comparison:
+    metric: str
+    base: float
+    new: float
+    regression: bool
+
+    @property
+    def change(self) -> float:
+        if self.base:
+            return (self.new - self.base) / self.base
+        # E.g., errors in a run whose base had none
+        return math.inf if self.new > 0 else 0.0
+
+
+def compare(base: Run, new: Run, threshold: float) -> list[Comparison]:
+    """Compare the overall metrics of two runs.
+
+    A metric is flagged as a regression if it got worse by more than `threshold`
+    (a fraction of the base value).
+    """
+    comparisons: list[Comparison] = []
+    for metric, higher_is_better in METRICS.items():
+        c = Comparison(
+            metric,
+            base.total[metric],
+            new.total[metric],
+            regression=False,
+        )
+        c.regression = (
+            c.change < -threshold if higher_is_better else c.change > threshold
+        )
+        comparisons.append(c)
+    return comparisons
+
+
+def print_runs(runs: list[Run]) -> None:
+    table = PrettyTable()
+    table.field_names = [
+        "id",
+        "shape",
+        "rate",
+        "req/s",
+        "errors",
+        "p95 (ms)",
+        "p99 (ms)",
+    ]
+    for run in runs:
+        total = run.total
+        table.add_row(
+            [
+                run.id,
+                run.shape,
+                run.data["params"].get("rate", ""),
+                f"{total['throughput']:.2f}",
+                int(total["errors"]),
+                f"{total['p95']:.1f}",
+                f"{total['p99']:.1f}",
+            ],
+        )
+    print(table)
+
+
+def print_comparison(base: Run, new: Run, comparisons: list[Comparison]) -> None:
+    print(f"base: {base.id}")
+    print(f"new:  {new.id}")
+    if base.shape != new.shape:
+        print("note: the runs were made against clusters with different shapes")
+    for param in PARAMS:
+        base_value = base.data["params"].get(param)
+        new_value = new.data["params"].get(param)
+        if base_value != new_value:
+            print(
+                f"warning: the runs were made with different {param} "
+                f"({base_value} and {new_value}), their metrics are not comparable",
+            )
+    table = PrettyTable()
+    table.field_names = ["metric", "base", "new", "change", ""]
+    for c in comparisons:
+        table.add_row(
+            [
+                c.metric,
+                f"{c.base:.2f}",
+                f"{c.new:.2f}",
+                f"{c.change:+.1%}",
+                "REGRESSION" if c.regression else "",
+            ],
+        )
+    print(table)
@@ -0,0 +1,72 @@
+"""Size the number of workers in each host from its hardware."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+# Shell snippet printing the number of logical cores, physical cores and total
+# memory (in KiB) of a host, one per line.
+PROBE_CMD = (
+    "nproc; "
+    "lscpu -p=CORE,SOCKET | grep -v '^#' | sort -u | wc -l; "
+    "awk '/^MemTotal:/ {print $2}' /proc/meminfo"
+)
+
+
+@dataclass(frozen=True)
+class HostResources:
+    logical_cores: int
+    physical_cores: int
+    memory_kib: int
+
+    @property
+    def memory_mib(self) -> int:
+        return self.memory_kib // 1024
+
+    @staticmethod
+    def parse(output: str) -> HostResources:
+        values = [int(line) for line in output.split()]
+        if len(values) != 3:
+            raise ValueError(f"unexpected output probing host: {output!r}")
+        logical, physical, memory = values
+        return HostResources(
+            logical_cores=logical,
+            # lscpu may be missing or report nothing in some virtual machines
+            physical_cores=physical or logical,
+            memory_kib=memory,
+        )
+
+
+@dataclass(frozen=True)
+class SizingPolicy:
+    # Memory reserved for each worker. This should be at least the memory limit of
+    # the tasks plus some slack for the sandbox.
+    memory_per_worker_mib: int = 2048
+    # Cores left for the ResourceService and the OS in every host.
+    reserved_cores: int = 1
+    # Extra cores left in the main host for the core services and the database.
+    reserved_main_cores: int = 2
+    # Memory left for the OS (and the core services and database in the main host).
+    reserved_memory_mib: int = 1024
+    reserved_main_memory_mib: int = 4096
+
+
+def propose_workers(
+    resources: HostResources,
+    policy: SizingPolicy,
+    *,
+    is_main: bool,
+) -> int:
+    """Propose a number of workers for a host.
+
+    Workers are limited to one per physical core, since running two workers in sibling
+    hyper-threads makes timings unreliable, and by the available memory.
+    """
+    cores = resources.physical_cores - policy.reserved_cores
+    memory = resources.memory_mib - policy.reserved_memory_mib
+    if is_main:
+        cores -= policy.reserved_main_cores
+        memory -= policy.reserved_main_memory_mib
+    # A worker host is only useful if it runs at least one worker
+    minimum = 0 if is_main else 1
+    return max(minimum, min(cores, memory // policy.memory_per_worker_mib))
@@ -0,0 +1,100 @@
+"""Database snapshots streamed from the main host.
+
+The dump is compressed in the main host and sent through the ssh connection straight
+into a local file, so nothing is written to the disk of the contest host.
+"""
+
+from __future__ import annotations
+
+import datetime
+import shlex
+from pathlib import Path
+
+from cms_tools.config import DBConf
+
+# Remote command compressing stdin to stdout for each supported format. Both use all
+# the cores of the host: zstd with its own threads and gzip through pigz when available.
+COMPRESSORS = {
+    "zstd": "zstd -q -T0 -3 -c",
+    "gzip": '"$(command -v pigz || echo gzip)" -c',
+}
+
+# Extension of the snapshots compressed with each compressor
+EXTENSIONS = {"zstd": "zst", "gzip": "gz"}
+
+_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+
+def dump_command(db: DBConf, host: str, compress: str) -> str:
+    """Build the remote command dumping the database listening in `host` to stdout.
+
+    The password is read from stdin so it doesn't show up in the process list of the
+    host. The dump uses the custom format, so it can be restored in parallel with
+    `pg_restore -j` after decompressing it.
+    """
+    dump = shlex.join(
+        [
+            "pg_dump",
+            "-h",
+            host,
+            "-p",
+            str(db.port),
+            "-U",
+            db.username,
+            "--format=custom",
+            "--compress=0",
+            db.name,
+        ],
+    )
+    return (
+        "set -o pipefail; read -r PGPASSWORD; export PGPASSWORD; "
+        f"{dump} | {COMPRESSORS[compress]}"
+    )
+
+
+def snapshot_name(db_name: str, time: datetime.datetime, compress: str) -> str:
+    return f"{db_name}-{time.strftime(_TIME_FORMAT)}.dump.{EXTENSIONS[compress]}"
+
+
+def list_snapshots(
+    directory: Path,
+    db_name: str,
+) -> list[tuple[datetime.datetime, Path]]:
+    """List the snapshots of a database in `directory` from oldest to newest."""
+    snapshots: list[tuple[datetime.datetime, Path]] = []
+    for path in directory.glob(f"{db_name}-*.dump.*"):
+        # Skip dumps in progress or left by an interrupted run (`.partial`)
+        if path.name.rpartition(".dump.")[2] not in EXTENSIONS.values():
+            continue
+        stamp = path.name.removeprefix(f"{db_name}-").split(".", 1)[0]
+        try:
+            time = datetime.datetime.strptime(stamp, _TIME_FORMAT)
+        except ValueError:
+            continue
+        snapshots.append((time, path))
+    return sorted(snapshots)
+
+
+def prune(
+    directory: Path,
+    db_name: str,
+    *,
+    keep: int | None,
+    max_age: datetime.timedelta | None,
+    now: datetime.datetime,
+) -> list[Path]:
+    """Delete old snapshots and return the deleted paths.
+
+    A snapshot is deleted if it isn't one of the newest `keep` or if it's older than
+    `max_age`. The newest snapshot is never deleted.
+    """
+    snapshots = list_snapshots(directory, db_name)[:-1]
+    keep_from = len(snapshots) + 1 - keep if keep is not None else 0
+    removed: list[Path] = []
+    for i, (time, path) in enumerate(snapshots):
+        too_many = i < keep_from
+        too_old = max_age is not None and now - time > max_age
+        if too_many or too_old:
+            path.unlink(missing_ok=True)
+            removed.append(path)
+    return removed
@@ -0,0 +1,190 @@
+"""Keep the CMS services running in screen sessions alive.
+
+Every host is checked periodically with a small script listing its screen sessions and
+listening ports. A service is down if its session is gone (the session ends when the
+service exits) or it isn't listening on one of its ports. Services found down are
+restarted with an exponential backoff, so one that keeps crashing isn't restarted in a
+tight loop, and every incident is logged.
+"""
+
+from __future__ import annotations
+
+import datetime
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+# Lists the screen sessions and the listening TCP ports of a host. Ports are checked in
+# the host itself since services may only listen on a private or loopback address.
+CHECK_SCRIPT = r"""
+echo '== sessions'
+screen -list
+if command -v ss >/dev/null; then
+  echo '== ports'
+  ss -Htln
+elif command -v netstat >/dev/null; then
+  echo '== ports'
+  netstat -tln | tail -n +3
+fi
+"""
+
+# Seconds a service must stay up after a restart for its backoff to be reset
+STABLE_AFTER = 60.0
+
+
+@dataclass(frozen=True)
+class Service:
+    host: str
+    session: str
+    ports: tuple[int, ...]
+    restart_cmd: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}/{self.session}"
+
+
+@dataclass(frozen=True)
+class HostState:
+    sessions: frozenset[str]
+    # None if the host has no tool to list them
+    ports: frozenset[int] | None
+
+    @staticmethod
+    def parse(output: str) -> HostState:
+        sessions: set[str] = set()
+        ports: set[int] | None = None
+        section = None
+        for line in output.splitlines():
+            if line.startswith("== "):
+                section = line[3:].strip()
+                if section == "ports":
+                    ports = set()
+            elif section == "sessions":
+                # e.g., "\t1234.resourceService\t(Detached)"
+                m = re.match(r"\s+\d+\.(\S+)\s", line)
+                if m and "(Dead" not in line:
+                    sessions.add(m[1])
+            elif section == "ports" and ports is not None:
+                # The local address is the fourth column in both ss and netstat
+                columns = line.split()
+                if len(columns) >= 4:
+                    port = columns[3].rpartition(":")[2]
+                    if port.isdigit():
+                        ports.add(int(port))
+        return HostState(
+            sessions=frozenset(sessions),
+            ports=None if ports is None else frozenset(ports),
+        )
+
+    def problem(self, service: Service) -> str | None:
+        """Describe why `service` is down, or return None if it's up."""
+        if service.session not in self.sessions:
+            return "screen session is gone"
+        if self.ports is not None:
+            closed = [str(p) for p in service.ports if p not in self.ports]
+            if closed:
+                return f"not listening on port(s) {', '.join(closed)}"
+        return None
+
+
+class IncidentLog:
+    """Print incidents and append them to a file."""
+
+    def __init__(self, path: Path | None) -> None:
+        self._path = path
+
+    def write(self, subject: str, message: str) -> None:
+        now = datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+        line = f"{now} {subject}: {message}"
+        print(line, flush=True)
+        if self._path is not None:
+            with self._path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+@dataclass
+class _ServiceState:
+    down_since: float | None = None
+    up_since: float | None = None
+    restarts: int = 0
+    next_restart: float = 0.0
+
+
+class Supervisor:
+    """Track the state of the services and decide which ones to restart.
+
+    A service that is down is restarted right away. If it's still down (or down again)
+    `backoff` seconds later it's restarted again, doubling the wait after every attempt
+    up to `max_backoff`. The wait is reset once the service stays up for STABLE_AFTER
+    seconds.
+    """
+
+    def __init__(
+        self,
+        services: list[Service],
+        log: IncidentLog,
+        *,
+        backoff: float,
+        max_backoff: float,
+    ) -> None:
+        self._services = services
+        self._log = log
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._states = {s.name: _ServiceState() for s in services}
+        self._unreachable: set[str] = set()
+
+    def step(
+        self,
+        observed: Mapping[str, HostState | None],
+        now: float,
+    ) -> list[Service]:
+        """Update the services with the state observed in each host (None if unreachable).
+
+        Return the services that must be restarted. Services in unreachable hosts are
+        left alone, since we can't tell whether they are down.
+        """
+        for host, state in observed.items():
+            if state is None and host not in self._unreachable:
+                self._unreachable.add(host)
+                self._log.write(host, "unreachable")
+            elif state is not None and host in self._unreachable:
+                self._unreachable.discard(host)
+                self._log.write(host, "reachable again")
+
+        restart: list[Service] = []
+        for service in self._services:
+            host_state = observed.get(service.host)
+            if host_state is None:
+                continue
+            state = self._states[service.name]
+            problem = host_state.problem(service)
+            if problem is None:
+                if state.down_since is not None:
+                    downtime = now - state.down_since
+                    self._log.write(service.name, f"up again after {downtime:.0f}s")
+                    state.down_since = None
+                if state.up_since is None:
+                    state.up_since = now
+                if state.restarts and now - state.up_since >= STABLE_AFTER:
+                    state.restarts = 0
+                    state.next_restart = 0.0
+                continue
+
+            state.up_since = None
+            if state.down_since is None:
+                state.down_since = now
+                self._log.write(service.name, f"down, {problem}")
+            if now >= state.next_restart:
+                delay = min(self._max_backoff, self._backoff * 2**state.restarts)
+                state.restarts += 1
+                state.next_restart = now + delay
+                self._log.write(
+                    service.name,
+                    f"restarting (attempt {state.restarts}, next one in {delay:.0f}s "
+                    "if still down)",
+                )
+                restart.append(service)
+        return restart
@@ -1,37 +1,62 @@
 from __future__ import annotations
 from prettytable import PrettyTable
 import csv
-from io import StringIO
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass, field
 from pathlib import Path
 import sys
 
+import csv_ingest
 
-def _read_csv_from_text(text: str) -> list[list[str]]:
-    csvfile = StringIO(text)
+# Number of rows shown at the beginning and the end of the preview
+PREVIEW_ROWS = 5
 
-    sample = csvfile.read(1024)
-    csvfile.seek(0)
 
-    sniffer = csv.Sniffer()
-    dialect = sniffer.sniff(sample)
-    csvfile.seek(0)
+@dataclass
+class _Preview:
+    head: list[list[str]] = field(default_factory=list[list[str]])
+    tail: deque[list[str]] = field(
+        default_factory=lambda: deque[list[str]](maxlen=PREVIEW_ROWS),
+    )
+    rows: int = 0
+    columns: int = 0
 
-    reader = csv.reader(csvfile, dialect)
-    return list(reader)
+    def add(self, row: list[str]) -> None:
+        if len(self.head) < PREVIEW_ROWS:
+            self.head.append(row)
+        else:
+            self.tail.append(row)
+        self.rows += 1
+        self.columns = max(self.columns, len(row))
 
 
-def _write_csv_to_file(data: list[list[str]], file: Path) -> None:
+def _write_csv_to_file(rows: Iterable[list[str]], file: Path) -> _Preview:
+    preview = _Preview()
     file.parent.mkdir(parents=True, exist_ok=True)
     with file.open(mode="w", newline="", encoding="utf-8") as csvfile:
         writer = csv.writer(csvfile)
-        writer.writerows(data)
+        for row in rows:
+            writer.writerow(row)
+            preview.add(row)
+    return preview
 
 
-def _print_data(data: list[list[str]]) -> None:
+def _print_preview(preview: _Preview) -> None:
     table = PrettyTable()
     table.header = False
-    table.add_rows(data)
-    print(table)
+
+    def pad(row: list[str]) -> list[str]:
+        return row + [""] * (preview.columns - len(row))
+
+    table.add_rows([pad(row) for row in preview.head])
+    if preview.tail:
+        if preview.rows > len(preview.head) + len(preview.tail):
+            table.add_row(["..."] * preview.columns)
+        table.add_rows([pad(row) for row in preview.tail])
+    if preview.rows > 0:
+        print(table)
+    print(f"{preview.rows} rows, {preview.columns} columns")
 
 
 def main() -> None:
@@ -40,13 +65,10 @@ def main() -> None:
     print()
     print("Paste CSV-like text and then hit ctrl-d to finish")
     print("-----------------------------------------")
-    text = ""
-    for line in sys.stdin:
-        text += line
-    data = _read_csv_from_text(text)
-    _write_csv_to_file(data, Path(file))
+    rows = csv_ingest.read_rows(sys.stdin)
+    preview = _write_csv_to_file(rows, Path(file))
     print("-----------------------------------------")
     print()
     print(f"Generated `{file}` with the following content")
     print()
-    _print_data(data)
+    _print_preview(preview)
@@ -0,0 +1,114 @@
+"""Run the load test against a local stub of the Contest Web Server."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from cms_tools.httpclient import HTTPError
+from cms_tools.loadtest import Credential, LoadTestOptions, run_load_test
+
+# Time the stub takes to answer a page
+PAGE_DELAY = 0.1
+
+
+class StubContestWebServer(BaseHTTPRequestHandler):
+    """Logs in users with password `good`, accepts submissions and fails user tests."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self._logged_in():
+            time.sleep(PAGE_DELAY)
+            self._send(200)
+        elif self.path == "/":
+            self._send(200, [("Set-Cookie", "_xsrf=abc; Path=/")])
+        else:
+            self._send(302, [("Location", f"/login?next={self.path}")])
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/login":
+            if parse_qs(body.decode()).get("password") == ["good"]:
+                self._send(302, [("Set-Cookie", "c_login=xyz"), ("Location", "/")])
+            else:
+                self._send(302, [("Location", "/?login_error=true")])
+        elif not self._logged_in():
+            self._send(302, [("Location", f"/login?next={self.path}")])
+        elif self.path.endswith("/submit"):
+            self._send(302, [("Location", "/")])
+        else:
+            self._send(503)
+
+    def _logged_in(self) -> bool:
+        return "c_login=" in (self.headers.get("Cookie") or "")
+
+    def _send(self, status: int, headers: list[tuple[str, str]] | None = None) -> None:
+        self.send_response(status)
+        for name, value in headers or []:
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class LoadTestTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubContestWebServer)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run_load_test(
+        self,
+        users: list[Credential],
+        weights: dict[str, float],
+    ) -> None:
+        options = LoadTestOptions(tasks=["a"], rate=20, duration=0.5, weights=weights)
+        self.result = asyncio.run(run_load_test([self.url], users, options))
+
+    def test_counts_failed_logins(self) -> None:
+        users = [Credential("alice", "good"), Credential("bob", "bad")]
+        self.run_load_test(users, {"submit": 1})
+
+        self.assertEqual(self.result.logins.count, 2)
+        self.assertEqual(self.result.logins.errors, 1)
+        # Logins are left out of the totals
+        self.assertEqual(self.result.requests, 10)
+        self.assertEqual(self.result.errors, 0)
+        self.assertEqual(self.result.summary()["total"]["count"], 10)
+
+    def test_counts_failed_actions(self) -> None:
+        self.run_load_test([Credential("alice", "good")], {"test": 1})
+
+        self.assertEqual(self.result.stats["test"].count, 10)
+        self.assertEqual(self.result.errors, 10)
+        self.assertEqual(self.result.throughput, 0.0)
+        self.assertEqual(self.result.summary()["total"]["error_rate"], 1.0)
+
+    def test_all_users_logged_out(self) -> None:
+        with self.assertRaisesRegex(HTTPError, "no user could log in"):
+            self.run_load_test([Credential("bob", "bad")], {"browse": 1})
+
+    def test_latency_includes_queueing(self) -> None:
+        # A single user can't keep up with an action every 50ms when each one takes
+        # 100ms, so the last actions wait ~0.5s for it after being released.
+        self.run_load_test([Credential("alice", "good")], {"browse": 1})
+
+        latencies = self.result.stats["browse"].latencies
+        self.assertEqual(len(latencies), 10)
+        self.assertGreater(max(latencies), 4 * PAGE_DELAY)
+        self.assertLess(min(latencies), 2 * PAGE_DELAY)
+
+
+if __name__ == "__main__":
+    unittest.main()